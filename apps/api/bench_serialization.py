@@ -0,0 +1,140 @@
+"""
+Compare the old and new serialization paths for product responses.
+
+Runs without a database on synthetic rows shaped like the query results:
+
+    python bench_serialization.py [--rows 100] [--points 720] [--repeat 200]
+"""
+import argparse
+import gzip
+import json
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+from responses import ORJSONResponse
+from routers.products import latest_offer, product_item
+
+ListRow = namedtuple("ListRow", "asin title brand category image_url updated_at price currency availability seller offer_fetched_at")
+PointRow = namedtuple("PointRow", "price currency availability change_type fetched_at")
+
+
+def make_list_rows(count: int, price_type):
+    now = datetime.now(timezone.utc)
+    return [
+        ListRow(
+            f"B{i:09d}", f"Sample product {i} with a reasonably long marketplace title", "Brand", "Electronics",
+            f"https://m.media-amazon.com/images/I/{i}.jpg", now, price_type("19.99"), "USD", "In Stock",
+            "Amazon.com", now - timedelta(minutes=i),
+        )
+        for i in range(count)
+    ]
+
+
+def make_points(count: int, price_type):
+    now = datetime.now(timezone.utc)
+    return [
+        PointRow(price_type("19.99"), "USD", "In Stock", "price_change", now - timedelta(hours=i))
+        for i in range(count)
+    ]
+
+
+def legacy_list(rows) -> bytes:
+    products = []
+    for row in rows:
+        products.append({
+            "asin": row.asin,
+            "title": row.title,
+            "brand": row.brand,
+            "category": row.category,
+            "image_url": row.image_url,
+            "latest_offer": {
+                "price": float(row.price) if row.price else None,
+                "currency": row.currency,
+                "availability": row.availability,
+                "seller": row.seller,
+                "fetched_at": row.offer_fetched_at.isoformat() if row.offer_fetched_at else None,
+            } if row.price else None,
+        })
+    content = jsonable_encoder({"products": products, "limit": len(rows), "offset": 0})
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def fast_list(rows) -> bytes:
+    products = [product_item(row) for row in rows]
+    return ORJSONResponse({"products": products, "limit": len(rows), "offset": 0}).body
+
+
+def legacy_detail(row, points) -> bytes:
+    sparkline = [
+        {
+            "price": float(p.price) if p.price else None,
+            "currency": p.currency,
+            "availability": p.availability,
+            "change_type": p.change_type,
+            "fetched_at": p.fetched_at.isoformat() if p.fetched_at else None,
+        }
+        for p in points
+    ]
+    content = jsonable_encoder({
+        "asin": row.asin,
+        "title": row.title,
+        "latest_offer": {
+            "price": float(row.price) if row.price else None,
+            "currency": row.currency,
+            "availability": row.availability,
+            "seller": row.seller,
+            "fetched_at": row.offer_fetched_at.isoformat() if row.offer_fetched_at else None,
+        } if row.price else None,
+        "sparkline": sparkline,
+    })
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def fast_detail(row, points) -> bytes:
+    return ORJSONResponse({
+        "asin": row.asin,
+        "title": row.title,
+        "latest_offer": latest_offer(row),
+        "sparkline": [p._asdict() for p in points],
+    }).body
+
+
+def timed(fn, repeat: int):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        body = fn()
+    return (time.perf_counter() - started) / repeat * 1000, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100, help="Products per list page")
+    parser.add_argument("--points", type=int, default=720, help="Sparkline points per detail response")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    # The old path received Decimals from the driver; the new one gets float8
+    legacy_rows, fast_rows = make_list_rows(args.rows, Decimal), make_list_rows(args.rows, float)
+    legacy_points, fast_points = make_points(args.points, Decimal), make_points(args.points, float)
+
+    cases = [
+        (f"list ({args.rows} rows)", lambda: legacy_list(legacy_rows), lambda: fast_list(fast_rows)),
+        (
+            f"detail ({args.points} points)",
+            lambda: legacy_detail(legacy_rows[0], legacy_points),
+            lambda: fast_detail(fast_rows[0], fast_points),
+        ),
+    ]
+    for name, legacy, fast in cases:
+        legacy_ms, legacy_body = timed(legacy, args.repeat)
+        fast_ms, fast_body = timed(fast, args.repeat)
+        print(f"📊 {name}")
+        print(f"  legacy: {legacy_ms:7.3f} ms  {len(legacy_body):>8} bytes")
+        print(f"  orjson: {fast_ms:7.3f} ms  {len(fast_body):>8} bytes  ({legacy_ms / fast_ms:.1f}x faster)")
+        print(f"  gzip:   {len(gzip.compress(fast_body)):>19} bytes on the wire")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import time
+from urllib.parse import urlencode
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import text
+from db import engine
+
+# Cached responses kept in memory per API process
+API_CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES") or "1024")
+# Upper bound on how long a response is served from memory, even without a new ingest
+API_CACHE_TTL_SECONDS = float(os.getenv("API_CACHE_TTL_SECONDS") or "300")
+# How often the ingest generation is re-read from the database
+API_CACHE_GENERATION_POLL_SECONDS = float(os.getenv("API_CACHE_GENERATION_POLL_SECONDS") or "2")
+# Cache-Control sent to clients and shared caches
+API_CACHE_MAX_AGE_SECONDS = int(os.getenv("API_CACHE_MAX_AGE_SECONDS") or "15")
+API_CACHE_STALE_WHILE_REVALIDATE_SECONDS = int(os.getenv("API_CACHE_STALE_WHILE_REVALIDATE_SECONDS") or "60")
+
+# GET paths whose responses only change when the ingestor writes
+CACHED_PATH_PREFIXES = ("/products", "/stats")
+
+GENERATION_QUERY = text("SELECT generation FROM ingest_state WHERE id = 1")
+
+
+@dataclass
+class CachedResponse:
+    generation: int
+    etag: str
+    body: bytes
+    media_type: Optional[str]
+    stored_at: float
+
+
+class ResponseCache:
+    """LRU cache of response bodies with a TTL, tagged with the ingest generation."""
+
+    def __init__(self, max_entries: int = API_CACHE_MAX_ENTRIES, ttl: float = API_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+
+    def get(self, key: str, generation: int) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.generation != generation or time.monotonic() - entry.stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CachedResponse):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+# Last generation read from ingest_state and when it was read
+_generation: Optional[int] = None
+_generation_read_at = 0.0
+
+
+async def current_generation() -> int:
+    """Return the ingest generation, re-reading it at most once per poll interval."""
+    global _generation, _generation_read_at
+    now = time.monotonic()
+    if _generation is None or now - _generation_read_at >= API_CACHE_GENERATION_POLL_SECONDS:
+        async with engine.connect() as conn:
+            _generation = (await conn.execute(GENERATION_QUERY)).scalar() or 0
+        _generation_read_at = now
+    return _generation
+
+
+def cache_key(request: Request) -> str:
+    """Normalize a request into a key: path plus sorted, re-encoded query parameters."""
+    # Re-encoded so a decoded "&" or "=" inside a value can't read as a separator
+    return request.url.path + "?" + urlencode(sorted(request.query_params.multi_items()))
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Weak ETag of the uncompressed body. GZipMiddleware sits outside the cache,
+    so the same tag is sent for the gzip and identity encodings of a response.
+    """
+    return 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _opaque_tag(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison, as If-None-Match calls for."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [_opaque_tag(tag.strip()) for tag in if_none_match.split(",")]
+    return "*" in tags or _opaque_tag(etag) in tags
+
+
+def cache_headers(etag: str) -> dict:
+    return {
+        "ETag": etag,
+        # Compression depends on Accept-Encoding, so shared caches must key on it
+        "Vary": "Accept-Encoding",
+        "Cache-Control": (
+            f"public, max-age={API_CACHE_MAX_AGE_SECONDS}, "
+            f"stale-while-revalidate={API_CACHE_STALE_WHILE_REVALIDATE_SECONDS}"
+        ),
+    }
+
+
+def cached_or_not_modified(request: Request, entry: CachedResponse, status: str) -> Response:
+    headers = cache_headers(entry.etag)
+    headers["X-Cache"] = status
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+
+async def cache_responses(request: Request, call_next):
+    """
+    Serve product reads from memory until the ingestor bumps the generation.
+
+    Matching If-None-Match requests get a 304 without running the handler,
+    so a hit never opens a database session.
+    """
+    if request.method != "GET" or not request.url.path.startswith(CACHED_PATH_PREFIXES):
+        return await call_next(request)
+
+    try:
+        generation = await current_generation()
+    except Exception as e:
+        print(f"⚠ Response cache bypassed, could not read ingest generation: {e}")
+        return await call_next(request)
+
+    # Read sessions only use replicas that have caught up to this generation
+    request.state.generation = generation
+
+    key = cache_key(request)
+    entry = response_cache.get(key, generation)
+    if entry:
+        return cached_or_not_modified(request, entry, "HIT")
+
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    entry = CachedResponse(
+        generation=generation,
+        etag=make_etag(body),
+        body=body,
+        media_type=response.headers.get("content-type"),
+        stored_at=time.monotonic(),
+    )
+    response_cache.set(key, entry)
+    return cached_or_not_modified(request, entry, "MISS")
@@ -1,12 +1,48 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from dotenv import load_dotenv
-from routers import health, products
+from cache import cache_responses
+from db import engine, prewarm_pool, replica_router
+from responses import ORJSONResponse
+from routers import export, health, products, stats
 
 load_dotenv()
 
-app = FastAPI(title="Amazon Pipeline API", version="0.1.0")
+# Responses smaller than this are sent uncompressed
+API_GZIP_MIN_BYTES = int(os.getenv("API_GZIP_MIN_BYTES") or "1024")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pool and prepare the hot product queries before taking traffic
+    try:
+        warmed = await prewarm_pool(warm_up=products.prepare_hot_queries)
+        print(f"🔥 Pre-warmed {warmed} database connections")
+    except Exception as e:
+        print(f"⚠ Could not pre-warm the database pool: {e}")
+    if replica_router:
+        replica_router.start()
+    yield
+    if replica_router:
+        await replica_router.stop()
+    await engine.dispose()
+    for replica in replica_router.replicas if replica_router else []:
+        await replica.engine.dispose()
+
+
+app = FastAPI(
+    title="Amazon Pipeline API",
+    version="0.1.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
+
+# Response cache for product reads; registered first so CORS headers are
+# added per request rather than stored with cached bodies
+app.middleware("http")(cache_responses)
 
 # CORS configuration
 cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
@@ -16,9 +52,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Cache"],
 )
 
+# Compress large product lists and sparklines on the way out
+app.add_middleware(GZipMiddleware, minimum_size=API_GZIP_MIN_BYTES)
+
 # Include routers
 app.include_router(health.router)
 app.include_router(products.router)
+app.include_router(stats.router)
+app.include_router(export.router)
 
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Text, DECIMAL, Integer, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, Computed, String, Text, DECIMAL, Integer, TIMESTAMP, ForeignKey
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
 from sqlalchemy.orm import DeclarativeBase, relationship
 
@@ -17,6 +18,11 @@ class Product(Base):
     image_url = Column(Text)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+    search_vector = Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(brand, '')), 'B')",
+        persisted=True,
+    ))
 
 
 class Offer(Base):
@@ -28,5 +34,19 @@ class Offer(Base):
     currency = Column(String(3), default="USD")
     availability = Column(String(50))
     seller = Column(String(255))
-    fetched_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    # Partition key of the monthly partitions, so part of the primary key
+    fetched_at = Column(TIMESTAMP(timezone=True), primary_key=True, server_default=func.now())
+    last_seen_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
 
+class CurrentOffer(Base):
+    __tablename__ = "current_offers"
+
+    product_id = Column(String(10), ForeignKey("products.asin", ondelete="CASCADE"), primary_key=True)
+    offer_id = Column(Integer, nullable=False)
+    first_seen_at = Column(TIMESTAMP(timezone=True))
+    price = Column(DECIMAL(10, 2))
+    currency = Column(String(3), default="USD")
+    availability = Column(Text)
+    seller = Column(String(255))
+    fetched_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
@@ -0,0 +1,228 @@
+import csv
+import io
+import os
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+import orjson
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from db import open_read_session
+
+router = APIRouter()
+
+# Rows fetched from the server-side cursor and encoded per chunk
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS") or "5000")
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Column names and Parquet types, in output order
+PRODUCT_COLUMNS = [
+    ("asin", "string"),
+    ("title", "string"),
+    ("brand", "string"),
+    ("category", "string"),
+    ("image_url", "string"),
+    ("created_at", "timestamp"),
+    ("updated_at", "timestamp"),
+    ("price", "float64"),
+    ("currency", "string"),
+    ("availability", "string"),
+    ("seller", "string"),
+    ("offer_fetched_at", "timestamp"),
+]
+
+OFFER_HISTORY_COLUMNS = [
+    ("id", "int64"),
+    ("product_id", "string"),
+    ("price", "float64"),
+    ("currency", "string"),
+    ("availability", "string"),
+    ("seller", "string"),
+    ("change_type", "string"),
+    ("fetched_at", "timestamp"),
+]
+
+
+def parse_asins(asins: Optional[str]) -> Optional[List[str]]:
+    if not asins:
+        return None
+    return [asin.strip() for asin in asins.split(",") if asin.strip()]
+
+
+async def stream_batches(query, params: dict) -> AsyncIterator[Sequence]:
+    """
+    Yield result rows in batches from a server-side cursor.
+
+    The session is opened here rather than through Depends(get_read_session)
+    so it stays open for as long as the response is streaming.
+    """
+    async with await open_read_session() as session:
+        result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_ROWS), params)
+        async for batch in result.mappings().partitions():
+            yield batch
+
+
+async def encode_ndjson(batches: AsyncIterator[Sequence], columns) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield b"".join(orjson.dumps(dict(row)) + b"\n" for row in batch)
+
+
+async def encode_csv(batches: AsyncIterator[Sequence], columns) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    yield buffer.getvalue().encode()
+
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in batch:
+            writer.writerow([
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in row.values()
+            ])
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+async def encode_parquet(batches: AsyncIterator[Sequence], columns) -> AsyncIterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"string": pa.string(), "int64": pa.int64(), "float64": pa.float64(), "timestamp": pa.timestamp("us", tz="UTC")}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    # One row group per batch, flushed to the client as soon as it is written
+    async for batch in batches:
+        writer.write_table(pa.Table.from_pylist([dict(row) for row in batch], schema=schema))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {"ndjson": encode_ndjson, "csv": encode_csv, "parquet": encode_parquet}
+
+
+def export_response(name: str, fmt: str, query, params: dict, columns) -> StreamingResponse:
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=400, detail="Parquet export requires pyarrow to be installed")
+
+    extension = "csv" if fmt == "csv" else fmt
+    return StreamingResponse(
+        ENCODERS[fmt](stream_batches(query, params), columns),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'},
+    )
+
+
+def range_conditions(column: str, since: Optional[datetime], until: Optional[datetime]) -> Tuple[List[str], dict]:
+    conditions, params = [], {}
+    if since is not None:
+        conditions.append(f"{column} >= :since")
+        params["since"] = since
+    if until is not None:
+        conditions.append(f"{column} < :until")
+        params["until"] = until
+    return conditions, params
+
+
+FORMAT_PATTERN = "^(" + "|".join(EXPORT_FORMATS) + ")$"
+
+
+@router.get("/export/products")
+async def export_products(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN, description="ndjson, csv or parquet"),
+    asins: Optional[str] = Query(None, description="Comma-separated ASINs"),
+    since: Optional[datetime] = Query(None, description="Only products updated at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only products updated before this time"),
+):
+    """Stream every product with its latest offer."""
+    conditions, params = range_conditions("p.updated_at", since, until)
+    asin_list = parse_asins(asins)
+    if asin_list:
+        conditions.append("p.asin = ANY(:asins)")
+        params["asins"] = asin_list
+
+    where_clause = " AND " + " AND ".join(conditions) if conditions else ""
+    query = text(f"""
+        SELECT
+            p.asin,
+            p.title,
+            p.brand,
+            p.category,
+            p.image_url,
+            p.created_at,
+            p.updated_at,
+            CAST(lo.price AS float8) AS price,
+            lo.currency,
+            lo.availability,
+            lo.seller,
+            lo.fetched_at as offer_fetched_at
+        FROM products p
+        LEFT JOIN current_offers lo ON p.asin = lo.product_id
+        WHERE 1=1 {where_clause}
+        ORDER BY p.asin
+    """)
+
+    return export_response("products", format, query, params, PRODUCT_COLUMNS)
+
+
+@router.get("/export/offer_history")
+async def export_offer_history(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN, description="ndjson, csv or parquet"),
+    asins: Optional[str] = Query(None, description="Comma-separated ASINs"),
+    since: Optional[datetime] = Query(None, description="Only changes fetched at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only changes fetched before this time"),
+):
+    """Stream offer_history rows in fetch order."""
+    conditions, params = range_conditions("fetched_at", since, until)
+    asin_list = parse_asins(asins)
+    if asin_list:
+        conditions.append("product_id = ANY(:asins)")
+        params["asins"] = asin_list
+
+    where_clause = " AND " + " AND ".join(conditions) if conditions else ""
+    query = text(f"""
+        SELECT
+            id,
+            product_id,
+            CAST(price AS float8) AS price,
+            currency,
+            availability,
+            seller,
+            change_type,
+            fetched_at
+        FROM offer_history
+        WHERE 1=1 {where_clause}
+        ORDER BY fetched_at, id
+    """)
+
+    return export_response("offer_history", format, query, params, OFFER_HISTORY_COLUMNS)
@@ -1,4 +1,5 @@
 from fastapi import APIRouter
+from db import pool_status, replica_status
 
 router = APIRouter()
 
@@ -7,3 +8,14 @@ router = APIRouter()
 async def health():
     return {"status": "ok"}
 
+
+@router.get("/health/pool")
+async def health_pool():
+    """Database pool occupancy, checkout wait times and connect times."""
+    return pool_status()
+
+
+@router.get("/health/replicas")
+async def health_replicas():
+    """Health, replication lag and pool of each read replica in DATABASE_READ_URLS, as of the last check."""
+    return {"replicas": replica_status()}
@@ -1,30 +1,310 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+import base64
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 from sqlalchemy import text
-from typing import Optional
-from db import get_session
+from typing import List, Optional, Tuple
+from pydantic import BaseModel, Field
+from db import get_read_session
+from responses import ORJSONResponse
 
 router = APIRouter()
 
+# Most ASINs accepted by POST /products/batch
+BATCH_MAX_ASINS = 500
 
-@router.get("/products")
-async def get_products(
-    q: Optional[str] = Query(None, description="Search query"),
-    brand: Optional[str] = Query(None),
-    category: Optional[str] = Query(None),
-    min_price: Optional[float] = Query(None),
-    max_price: Optional[float] = Query(None),
-    in_stock: Optional[bool] = Query(None),
-    limit: int = Query(50, ge=1, le=100),
-    offset: int = Query(0, ge=0),
-    session: AsyncSession = Depends(get_session),
-):
+# Sparkline windows, and the default and largest number of points returned
+SPARKLINE_RANGES = {
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+    "90d": timedelta(days=90),
+    "180d": timedelta(days=180),
+    "365d": timedelta(days=365),
+}
+# Windows longer than this are served from the ingestor's price_daily rollup
+SPARKLINE_RAW_MAX_SPAN = timedelta(days=90)
+SPARKLINE_RANGE_PATTERN = "^(" + "|".join(SPARKLINE_RANGES) + ")$"
+SPARKLINE_DEFAULT_POINTS = 120
+SPARKLINE_MAX_POINTS = 1000
+
+# Splits the window into equal time buckets per product and keeps the last
+# change in each, with the bucket's min and max price, so the payload is
+# bounded by :points however dense the history is
+SPARKLINE_QUERY = text("""
+    WITH history AS (
+        SELECT 
+            product_id,
+            price,
+            currency,
+            availability,
+            change_type,
+            fetched_at,
+            LEAST(
+                width_bucket(
+                    EXTRACT(EPOCH FROM fetched_at),
+                    EXTRACT(EPOCH FROM NOW() - CAST(:span AS interval)),
+                    EXTRACT(EPOCH FROM NOW()),
+                    CAST(:points AS integer)
+                ),
+                CAST(:points AS integer)
+            ) AS bucket
+        FROM offer_history
+        WHERE product_id = ANY(:asins)
+          AND fetched_at >= NOW() - CAST(:span AS interval)
+    )
+    SELECT DISTINCT ON (product_id, bucket)
+        product_id,
+        CAST(price AS float8) AS price,
+        currency,
+        availability,
+        change_type,
+        fetched_at,
+        CAST(MIN(price) OVER bucket_window AS float8) AS min_price,
+        CAST(MAX(price) OVER bucket_window AS float8) AS max_price
+    FROM history
+    WINDOW bucket_window AS (PARTITION BY product_id, bucket)
+    ORDER BY product_id, bucket, fetched_at DESC
+""")
+
+# Same shape as SPARKLINE_QUERY, bucketing daily OHLC rows instead: each point
+# is the close of the last day in its bucket, with the bucket's low and high.
+# price_daily only has rows for days with changes, so each product's last row
+# before the window is carried forward as a point at its start.
+SPARKLINE_DAILY_QUERY = text("""
+    WITH window_start AS (
+        SELECT CAST(NOW() AT TIME ZONE 'UTC' AS date) - CAST(:days AS integer) AS day
+    ),
+    daily_rows AS (
+        SELECT product_id, day, close, low, high, currency, availability, FALSE AS carried
+        FROM price_daily
+        WHERE product_id = ANY(:asins)
+          AND day >= (SELECT day FROM window_start)
+        UNION ALL
+        SELECT a.product_id, (SELECT day FROM window_start), prev.close, prev.close, prev.close,
+            prev.currency, prev.availability, TRUE
+        FROM unnest(CAST(:asins AS varchar[])) AS a(product_id)
+        CROSS JOIN LATERAL (
+            SELECT pd.close, pd.currency, pd.availability
+            FROM price_daily pd
+            WHERE pd.product_id = a.product_id
+              AND pd.day < (SELECT day FROM window_start)
+            ORDER BY pd.day DESC
+            LIMIT 1
+        ) prev
+    ),
+    daily AS (
+        SELECT
+            daily_rows.*,
+            LEAST(
+                width_bucket(
+                    day - (SELECT day FROM window_start),
+                    0,
+                    CAST(:days AS integer) + 1,
+                    CAST(:points AS integer)
+                ),
+                CAST(:points AS integer)
+            ) AS bucket
+        FROM daily_rows
+    )
+    SELECT DISTINCT ON (product_id, bucket)
+        product_id,
+        CAST(close AS float8) AS price,
+        currency,
+        availability,
+        CAST(NULL AS text) AS change_type,
+        CAST(day AS timestamp) AT TIME ZONE 'UTC' AS fetched_at,
+        CAST(MIN(low) OVER bucket_window AS float8) AS min_price,
+        CAST(MAX(high) OVER bucket_window AS float8) AS max_price
+    FROM daily
+    WINDOW bucket_window AS (PARTITION BY product_id, bucket)
+    ORDER BY product_id, bucket, day DESC, carried
+""")
+
+RECENT_ORDER = "p.updated_at DESC, p.asin DESC"
+KEYSET_CONDITION = "(p.updated_at, p.asin) < (:cursor_updated_at, :cursor_asin)"
+
+# Product list page; {where_clause} holds the filters and {order_by} the sort
+PRODUCT_LIST_SQL = """
+    SELECT 
+        p.asin,
+        p.title,
+        p.brand,
+        p.category,
+        p.image_url,
+        p.updated_at,
+        CAST(lo.price AS float8) AS price,
+        lo.currency,
+        lo.availability,
+        lo.seller,
+        lo.fetched_at as offer_fetched_at
+    FROM products p
+    LEFT JOIN current_offers lo ON p.asin = lo.product_id
+    WHERE 1=1 {where_clause}
+    ORDER BY {order_by}
+    LIMIT :limit OFFSET :offset
+"""
+
+PRODUCT_DETAIL_QUERY = text("""
+    SELECT 
+        p.asin,
+        p.title,
+        p.brand,
+        p.category,
+        p.image_url,
+        p.created_at,
+        p.updated_at,
+        CAST(lo.price AS float8) AS price,
+        lo.currency,
+        lo.availability,
+        lo.seller,
+        lo.fetched_at as offer_fetched_at
+    FROM products p
+    LEFT JOIN current_offers lo ON p.asin = lo.product_id
+    WHERE p.asin = :asin
+""")
+
+
+# Lower edges of the price facet buckets; keep in step with the ingestor's rollups.py
+PRICE_BUCKET_EDGES = (0, 25, 50, 100, 250, 500, 1000)
+# Most brand and category values returned per facet
+FACET_MAX_VALUES = 100
+
+FACET_COUNTS_SQL = f"""
+    SELECT facet, value, count
+    FROM (
+        SELECT
+            CASE
+                WHEN GROUPING(brand) = 0 THEN 'brand'
+                WHEN GROUPING(category) = 0 THEN 'category'
+                WHEN GROUPING(stock) = 0 THEN 'stock'
+                ELSE 'price'
+            END AS facet,
+            COALESCE(brand, category, stock, CAST(price_bucket AS text)) AS value,
+            COUNT(*) AS count
+        FROM (
+            SELECT
+                p.brand,
+                p.category,
+                CASE WHEN lo.availability ILIKE '%in stock%' THEN 'in_stock' ELSE 'out_of_stock' END AS stock,
+                width_bucket(lo.price, CAST(ARRAY{list(PRICE_BUCKET_EDGES)} AS numeric[])) AS price_bucket
+            FROM products p
+            LEFT JOIN current_offers lo ON p.asin = lo.product_id
+            WHERE 1=1 {{where_clause}}
+        ) f
+        GROUP BY GROUPING SETS ((brand), (category), (stock), (price_bucket))
+    ) counts
+    WHERE value IS NOT NULL
+"""
+
+
+class BatchRequest(BaseModel):
+    asins: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_ASINS)
+    points: int = Field(SPARKLINE_DEFAULT_POINTS, ge=2, le=SPARKLINE_MAX_POINTS)
+    range: str = Field("30d", pattern=SPARKLINE_RANGE_PATTERN)
+
+
+def encode_cursor(updated_at: datetime, asin: str) -> str:
+    """Encode the (updated_at, asin) position of a row as an opaque cursor."""
+    raw = f"{updated_at.isoformat()}|{asin}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a cursor produced by encode_cursor, or raise a 400."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_at, asin = raw.split("|", 1)
+        position = datetime.fromisoformat(updated_at)
+        # encode_cursor always writes the offset; anything else was not ours
+        if position.tzinfo is None:
+            raise ValueError("cursor timestamp has no offset")
+        return position, asin
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# Rows come back with JSON-ready types (prices cast to float8, timestamps
+# rendered by orjson), so mapping them to the response is plain field access
+def latest_offer(row) -> Optional[dict]:
+    if not row.price:
+        return None
+    return {
+        "price": row.price,
+        "currency": row.currency,
+        "availability": row.availability,
+        "seller": row.seller,
+        "fetched_at": row.offer_fetched_at,
+    }
+
+
+async def load_sparklines(session: AsyncSession, asins: List[str], points: int, span: str) -> dict:
+    """
+    Downsampled sparklines for many ASINs in one query, grouped per ASIN in one pass.
+
+    Windows up to SPARKLINE_RAW_MAX_SPAN read raw offer_history rows; longer
+    ones read the daily rollup, whose points carry no change_type.
+    """
+    sparklines = {asin: [] for asin in asins}
+    window = SPARKLINE_RANGES[span]
+    if window > SPARKLINE_RAW_MAX_SPAN:
+        query, params = SPARKLINE_DAILY_QUERY, {"asins": asins, "points": points, "days": window.days}
+    else:
+        query, params = SPARKLINE_QUERY, {"asins": asins, "points": points, "span": window}
+    result = await session.execute(query, params)
+    for point in result.mappings():
+        point = dict(point)
+        sparklines[point.pop("product_id")].append(point)
+    return sparklines
+
+
+def detail_item(row, sparkline: list) -> dict:
+    return {
+        "asin": row.asin,
+        "title": row.title,
+        "brand": row.brand,
+        "category": row.category,
+        "image_url": row.image_url,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "latest_offer": latest_offer(row),
+        "sparkline": sparkline,
+    }
+
+
+def product_item(row) -> dict:
+    return {
+        "asin": row.asin,
+        "title": row.title,
+        "brand": row.brand,
+        "category": row.category,
+        "image_url": row.image_url,
+        "latest_offer": latest_offer(row),
+    }
+
+
+def filter_conditions(
+    q: Optional[str],
+    brand: Optional[str],
+    category: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    in_stock: Optional[bool],
+) -> Tuple[List[str], dict]:
+    """SQL conditions and bind params for the product filters, over products p and current_offers lo."""
     conditions = []
     params = {}
 
     if q:
-        conditions.append("p.title ILIKE :q")
-        params["q"] = f"%{q}%"
+        # Ranked word search on the GIN-indexed tsvector, plus trigram-indexed
+        # substring and typo-tolerant matches on the title
+        conditions.append(
+            "(p.search_vector @@ websearch_to_tsquery('english', :q)"
+            " OR p.title ILIKE :q_pattern"
+            " OR :q <% p.title)"
+        )
+        params["q"] = q
+        params["q_pattern"] = f"%{q}%"
 
     if brand:
         conditions.append("p.brand = :brand")
@@ -50,32 +330,45 @@ async def get_products(
             conditions.append("(lo.availability IS NULL OR lo.availability NOT ILIKE :in_stock_pattern)")
             params["in_stock_pattern"] = "%in stock%"
 
+    return conditions, params
+
+
+@router.get("/products")
+async def get_products(
+    q: Optional[str] = Query(None, description="Search query"),
+    brand: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None),
+    max_price: Optional[float] = Query(None),
+    in_stock: Optional[bool] = Query(None),
+    limit: int = Query(50, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; offset is ignored when set"),
+    sort: str = Query("recent", pattern="^(recent|relevance)$", description="recent, or relevance when q is set"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    conditions, params = filter_conditions(q, brand, category, min_price, max_price, in_stock)
+
+    by_relevance = sort == "relevance" and bool(q)
+    if by_relevance and cursor:
+        raise HTTPException(status_code=400, detail="cursor is only supported with sort=recent")
+
+    # Keyset pagination: seek straight past the last row of the previous page
+    if cursor:
+        conditions.append(KEYSET_CONDITION)
+        params["cursor_updated_at"], params["cursor_asin"] = decode_cursor(cursor)
+        offset = 0
+
     where_clause = " AND " + " AND ".join(conditions) if conditions else ""
 
-    query = text(f"""
-        WITH latest_offers AS (
-            SELECT DISTINCT ON (product_id)
-                id, product_id, price, currency, availability, seller, fetched_at
-            FROM offers
-            ORDER BY product_id, fetched_at DESC
+    order_by = RECENT_ORDER
+    if by_relevance:
+        order_by = (
+            "ts_rank_cd(p.search_vector, websearch_to_tsquery('english', :q)) DESC, "
+            "word_similarity(:q, p.title) DESC, " + order_by
         )
-        SELECT 
-            p.asin,
-            p.title,
-            p.brand,
-            p.category,
-            p.image_url,
-            lo.price,
-            lo.currency,
-            lo.availability,
-            lo.seller,
-            lo.fetched_at as offer_fetched_at
-        FROM products p
-        LEFT JOIN latest_offers lo ON p.asin = lo.product_id
-        WHERE 1=1 {where_clause}
-        ORDER BY p.updated_at DESC
-        LIMIT :limit OFFSET :offset
-    """)
+
+    query = text(PRODUCT_LIST_SQL.format(where_clause=where_clause, order_by=order_by))
 
     params["limit"] = limit
     params["offset"] = offset
@@ -83,40 +376,101 @@ async def get_products(
     result = await session.execute(query, params)
     rows = result.fetchall()
 
-    products = []
+    products = [product_item(row) for row in rows]
+
+    next_cursor = None
+    if len(rows) == limit and not by_relevance:
+        next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].asin)
+
+    return ORJSONResponse({"products": products, "limit": limit, "offset": offset, "next_cursor": next_cursor})
+
+
+async def prepare_hot_queries(conn: AsyncConnection):
+    """
+    Run the default list page, the next-page seek, the detail lookup and the
+    default sparkline once on a connection, so their statements are compiled
+    and prepared before the first request lands on it.
+    """
+    page = {"limit": 50, "offset": 0}
+    await conn.execute(text(PRODUCT_LIST_SQL.format(where_clause="", order_by=RECENT_ORDER)), page)
+    await conn.execute(
+        text(PRODUCT_LIST_SQL.format(where_clause=" AND " + KEYSET_CONDITION, order_by=RECENT_ORDER)),
+        {**page, "cursor_updated_at": datetime.now(timezone.utc), "cursor_asin": ""},
+    )
+    await conn.execute(PRODUCT_DETAIL_QUERY, {"asin": ""})
+    await conn.execute(SPARKLINE_QUERY, {
+        "asins": [""],
+        "points": SPARKLINE_DEFAULT_POINTS,
+        "span": SPARKLINE_RANGES["30d"],
+    })
+
+
+def facets_response(rows) -> dict:
+    """Shape (facet, value, count) rows into the /products/facets response."""
+    brands, categories, price_buckets = [], [], []
+    stock = {"in_stock": 0, "out_of_stock": 0}
+
     for row in rows:
-        products.append({
-            "asin": row.asin,
-            "title": row.title,
-            "brand": row.brand,
-            "category": row.category,
-            "image_url": row.image_url,
-            "latest_offer": {
-                "price": float(row.price) if row.price else None,
-                "currency": row.currency,
-                "availability": row.availability,
-                "seller": row.seller,
-                "fetched_at": row.offer_fetched_at.isoformat() if row.offer_fetched_at else None,
-            } if row.price else None,
-        })
-
-    return {"products": products, "limit": limit, "offset": offset}
+        if row.facet == "brand":
+            brands.append({"value": row.value, "count": row.count})
+        elif row.facet == "category":
+            categories.append({"value": row.value, "count": row.count})
+        elif row.facet == "stock":
+            stock[row.value] = row.count
+        elif row.facet == "price":
+            bucket = int(row.value)
+            price_buckets.append({
+                "min": PRICE_BUCKET_EDGES[bucket - 1],
+                "max": PRICE_BUCKET_EDGES[bucket] if bucket < len(PRICE_BUCKET_EDGES) else None,
+                "count": row.count,
+            })
 
+    by_count = lambda item: (-item["count"], item["value"])
+    return {
+        "brands": sorted(brands, key=by_count)[:FACET_MAX_VALUES],
+        "categories": sorted(categories, key=by_count)[:FACET_MAX_VALUES],
+        "stock": stock,
+        "price_buckets": sorted(price_buckets, key=lambda item: item["min"]),
+    }
 
-@router.get("/products/{asin}")
-async def get_product_detail(
-    asin: str,
-    session: AsyncSession = Depends(get_session),
+
+# Declared before /products/{asin} so "facets" isn't taken for an ASIN
+@router.get("/products/facets")
+async def get_product_facets(
+    q: Optional[str] = Query(None, description="Search query"),
+    brand: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None),
+    max_price: Optional[float] = Query(None),
+    in_stock: Optional[bool] = Query(None),
+    session: AsyncSession = Depends(get_read_session),
 ):
-    # Get product with latest offer
-    query = text("""
-        WITH latest_offer AS (
-            SELECT DISTINCT ON (product_id)
-                id, product_id, price, currency, availability, seller, fetched_at
-            FROM offers
-            WHERE product_id = :asin
-            ORDER BY product_id, fetched_at DESC
-        )
+    """Brand, category, stock and price-bucket counts for the current filters."""
+    conditions, params = filter_conditions(q, brand, category, min_price, max_price, in_stock)
+
+    rows = []
+    if not conditions:
+        # Unfiltered counts are precomputed by the ingestor after each cycle
+        result = await session.execute(text("SELECT facet, value, count FROM facet_counts"))
+        rows = result.fetchall()
+
+    if conditions or not rows:
+        where_clause = " AND " + " AND ".join(conditions) if conditions else ""
+        result = await session.execute(text(FACET_COUNTS_SQL.format(where_clause=where_clause)), params)
+        rows = result.fetchall()
+
+    return ORJSONResponse(facets_response(rows))
+
+
+@router.post("/products/batch")
+async def get_products_batch(
+    request: BatchRequest,
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Details, latest offers and downsampled sparklines for many ASINs in two queries."""
+    asins = list(dict.fromkeys(request.asins))
+
+    products_query = text("""
         SELECT 
             p.asin,
             p.title,
@@ -125,66 +479,42 @@ async def get_product_detail(
             p.image_url,
             p.created_at,
             p.updated_at,
-            lo.price,
+            CAST(lo.price AS float8) AS price,
             lo.currency,
             lo.availability,
             lo.seller,
             lo.fetched_at as offer_fetched_at
         FROM products p
-        LEFT JOIN latest_offer lo ON p.asin = lo.product_id
-        WHERE p.asin = :asin
+        LEFT JOIN current_offers lo ON p.asin = lo.product_id
+        WHERE p.asin = ANY(:asins)
     """)
 
-    result = await session.execute(query, {"asin": asin})
-    row = result.fetchone()
+    result = await session.execute(products_query, {"asins": asins})
+    rows = {row.asin: row for row in result.fetchall()}
 
-    if not row:
-        from fastapi import HTTPException
-        raise HTTPException(status_code=404, detail="Product not found")
+    sparklines = await load_sparklines(session, list(rows), request.points, request.range)
 
-    # Get sparkline data (last 30 days)
-    sparkline_query = text("""
-        SELECT 
-            price,
-            currency,
-            availability,
-            change_type,
-            fetched_at
-        FROM offer_history
-        WHERE product_id = :asin
-          AND fetched_at >= NOW() - INTERVAL '30 days'
-        ORDER BY fetched_at ASC
-    """)
+    return ORJSONResponse({
+        "products": [detail_item(rows[asin], sparklines[asin]) for asin in asins if asin in rows],
+        "missing": [asin for asin in asins if asin not in rows],
+    })
 
-    sparkline_result = await session.execute(sparkline_query, {"asin": asin})
-    sparkline_rows = sparkline_result.fetchall()
 
-    sparkline = [
-        {
-            "price": float(row.price) if row.price else None,
-            "currency": row.currency,
-            "availability": row.availability,
-            "change_type": row.change_type,
-            "fetched_at": row.fetched_at.isoformat() if row.fetched_at else None,
-        }
-        for row in sparkline_rows
-    ]
+@router.get("/products/{asin}")
+async def get_product_detail(
+    asin: str,
+    points: int = Query(SPARKLINE_DEFAULT_POINTS, ge=2, le=SPARKLINE_MAX_POINTS, description="Most sparkline points returned"),
+    span: str = Query("30d", alias="range", pattern=SPARKLINE_RANGE_PATTERN, description="Sparkline window: 24h, 7d, 30d, 90d, 180d or 365d"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    # Get product with latest offer
+    result = await session.execute(PRODUCT_DETAIL_QUERY, {"asin": asin})
+    row = result.fetchone()
 
-    return {
-        "asin": row.asin,
-        "title": row.title,
-        "brand": row.brand,
-        "category": row.category,
-        "image_url": row.image_url,
-        "created_at": row.created_at.isoformat() if row.created_at else None,
-        "updated_at": row.updated_at.isoformat() if row.updated_at else None,
-        "latest_offer": {
-            "price": float(row.price) if row.price else None,
-            "currency": row.currency,
-            "availability": row.availability,
-            "seller": row.seller,
-            "fetched_at": row.offer_fetched_at.isoformat() if row.offer_fetched_at else None,
-        } if row.price else None,
-        "sparkline": sparkline,
-    }
+    if not row:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    # Get sparkline data, downsampled to at most `points` buckets
+    sparklines = await load_sparklines(session, [asin], points, span)
 
+    return ORJSONResponse(detail_item(row, sparklines[asin]))
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from db import get_read_session
+from responses import ORJSONResponse
+
+router = APIRouter()
+
+# Days of trend data returned by /stats
+STATS_TREND_DAYS = 30
+
+
+@router.get("/stats")
+async def get_stats(session: AsyncSession = Depends(get_read_session)):
+    """Catalog-wide KPIs and a 30-day trend, read from rollups the ingestor refreshes."""
+    catalog_query = text("""
+        SELECT 
+            product_count,
+            priced_count,
+            in_stock_count,
+            CAST(avg_price AS float8) AS avg_price,
+            CAST(median_price AS float8) AS median_price,
+            refreshed_at
+        FROM catalog_stats
+        WHERE id = 1
+    """)
+
+    trend_query = text("""
+        SELECT 
+            day,
+            offers_count,
+            CAST(avg_price AS float8) AS avg_price,
+            price_changes,
+            availability_changes
+        FROM daily_stats
+        WHERE day > CAST(NOW() AT TIME ZONE 'UTC' AS date) - CAST(:days AS integer)
+        ORDER BY day ASC
+    """)
+
+    catalog = (await session.execute(catalog_query)).fetchone()
+    trend = [dict(day) for day in (await session.execute(trend_query, {"days": STATS_TREND_DAYS})).mappings()]
+
+    product_count = catalog.product_count if catalog else 0
+    in_stock_count = catalog.in_stock_count if catalog else 0
+
+    return ORJSONResponse({
+        "product_count": product_count,
+        "priced_count": catalog.priced_count if catalog else 0,
+        "in_stock_count": in_stock_count,
+        "in_stock_ratio": in_stock_count / product_count if product_count else 0.0,
+        "avg_price": catalog.avg_price if catalog else None,
+        "median_price": catalog.median_price if catalog else None,
+        "price_changes_30d": sum(day["price_changes"] for day in trend),
+        "refreshed_at": catalog.refreshed_at if catalog else None,
+        "trend": trend,
+    })
@@ -0,0 +1,118 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import cache
+from cache import cache_key, cache_responses, etag_matches, make_etag
+from responses import ORJSONResponse
+
+
+def make_request(path="/products", query=b"", headers=()):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query,
+        "headers": [(name.encode(), value.encode()) for name, value in headers],
+    })
+
+
+def test_cache_key_sorts_parameters():
+    assert cache_key(make_request(query=b"limit=20&brand=Sony")) == cache_key(make_request(query=b"brand=Sony&limit=20"))
+
+
+def test_cache_key_keeps_repeated_parameters():
+    assert cache_key(make_request(query=b"asins=B&asins=A")) == "/products?asins=A&asins=B"
+
+
+def test_cache_key_does_not_confuse_encoded_separators():
+    encoded = make_request(query=b"brand=Apple%26category%3DPhones")
+    separate = make_request(query=b"brand=Apple&category=Phones")
+
+    assert cache_key(encoded) != cache_key(separate)
+
+
+def test_cache_key_differs_by_path():
+    assert cache_key(make_request("/products")) != cache_key(make_request("/stats"))
+
+
+def test_etag_matches():
+    etag = make_etag(b"body")
+
+    assert etag.startswith('W/"')
+    assert not etag_matches(make_request(), etag)
+    assert etag_matches(make_request(headers=[("if-none-match", etag)]), etag)
+    # Weak comparison: a strong tag with the same opaque value matches
+    assert etag_matches(make_request(headers=[("if-none-match", etag[2:])]), etag)
+    assert etag_matches(make_request(headers=[("if-none-match", f'"other", {etag}')]), etag)
+    assert etag_matches(make_request(headers=[("if-none-match", "*")]), etag)
+    assert not etag_matches(make_request(headers=[("if-none-match", make_etag(b"other"))]), etag)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    generation = {"value": 1}
+    calls = []
+
+    async def current_generation():
+        return generation["value"]
+
+    monkeypatch.setattr(cache, "current_generation", current_generation)
+    monkeypatch.setattr(cache, "response_cache", cache.ResponseCache())
+
+    app = FastAPI()
+    app.middleware("http")(cache_responses)
+
+    @app.get("/products")
+    async def products(brand: str = "", category: str = ""):
+        calls.append((brand, category))
+        return ORJSONResponse({"brand": brand, "category": category, "calls": len(calls)})
+
+    with TestClient(app) as client:
+        client.calls = calls
+        client.generation = generation
+        yield client
+
+
+def test_miss_then_hit(client):
+    first = client.get("/products?brand=Sony")
+    second = client.get("/products?brand=Sony")
+
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "HIT"
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.headers["vary"] == "Accept-Encoding"
+    assert len(client.calls) == 1
+
+
+def test_matching_if_none_match_is_a_304_without_running_the_handler(client):
+    etag = client.get("/products?brand=Sony").headers["etag"]
+
+    response = client.get("/products?brand=Sony", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert len(client.calls) == 1
+
+
+def test_encoded_separator_is_not_served_another_response(client):
+    separate = client.get("/products", params={"brand": "Apple", "category": "Phones"})
+    encoded = client.get("/products", params={"brand": "Apple&category=Phones"})
+
+    assert encoded.headers["x-cache"] == "MISS"
+    assert encoded.json()["brand"] == "Apple&category=Phones"
+    assert encoded.headers["etag"] != separate.headers["etag"]
+    assert client.get(
+        "/products", params={"brand": "Apple&category=Phones"}, headers={"If-None-Match": separate.headers["etag"]}
+    ).status_code == 200
+
+
+def test_new_generation_misses(client):
+    client.get("/products?brand=Sony")
+    client.generation["value"] = 2
+
+    assert client.get("/products?brand=Sony").headers["x-cache"] == "MISS"
+    assert len(client.calls) == 2
@@ -0,0 +1,45 @@
+import base64
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from routers.products import decode_cursor, encode_cursor
+
+
+def b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    updated_at = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+    cursor = encode_cursor(updated_at, "B07XJ8C8F5")
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (updated_at, "B07XJ8C8F5")
+
+
+def test_cursor_round_trip_keeps_separator_in_asin():
+    updated_at = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+    assert decode_cursor(encode_cursor(updated_at, "odd|asin")) == (updated_at, "odd|asin")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "!!!!",
+    "abcde",
+    b64(b"\xff\xfe\xfd"),
+    b64(b"no separator"),
+    b64(b"yesterday|B07XJ8C8F5"),
+    b64(b'{"updated_at": "2024-05-01T00:00:00+00:00", "asin": "B07XJ8C8F5"}'),
+    b64(b"2024-05-01T00:00:00|B07XJ8C8F5"),
+    encode_cursor(datetime(2024, 5, 1, tzinfo=timezone.utc), "B07XJ8C8F5")[:-3] + "~~~",
+])
+def test_malformed_or_tampered_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+
+    assert error.value.status_code == 400
+    assert error.value.detail == "Invalid cursor"
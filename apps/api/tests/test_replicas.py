@@ -0,0 +1,150 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.engine import make_url
+
+import db
+
+
+class StubEngine:
+    """Answers REPLICA_STATE_QUERY with a fixed lag and generation, or fails to connect."""
+
+    def __init__(self, lag_seconds=0.0, generation=0, disconnected=False, error=None, delay=0.0):
+        self.url = make_url("postgresql+asyncpg://postgres@replica:5432/amazon")
+        self.state = SimpleNamespace(disconnected=disconnected, lag_seconds=lag_seconds, generation=generation)
+        self.error = error
+        self.delay = delay
+
+    @asynccontextmanager
+    async def connect(self):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        yield self
+
+    async def execute(self, statement):
+        return SimpleNamespace(one=lambda: self.state)
+
+
+def make_replica(engine) -> db.Replica:
+    return db.Replica(engine=engine, sessionmaker=db.make_sessionmaker(engine))
+
+
+@pytest.fixture
+def use_router(monkeypatch):
+    def install(*replicas):
+        router = db.ReplicaRouter(list(replicas))
+        monkeypatch.setattr(db, "replica_router", router)
+        return router
+    return install
+
+
+def read_session_bind(min_generation=None):
+    async def run():
+        session = await db.open_read_session(min_generation)
+        await session.close()
+        return session.bind
+    return asyncio.run(run())
+
+
+def test_lagging_replica_falls_back_to_primary(use_router):
+    replica = make_replica(StubEngine(lag_seconds=db.DB_REPLICA_MAX_LAG_SECONDS + 30))
+    router = use_router(replica)
+
+    asyncio.run(router.refresh())
+
+    assert not replica.healthy
+    assert "behind the primary" in replica.error
+    assert read_session_bind() is db.engine
+
+
+def test_replica_cut_off_from_primary_falls_back_to_primary(use_router):
+    # Replay has caught up with the little it received, so lag looks like zero
+    replica = make_replica(StubEngine(lag_seconds=0.0, disconnected=True))
+    router = use_router(replica)
+
+    asyncio.run(router.refresh())
+
+    assert not replica.healthy
+    assert replica.error == "not streaming from the primary"
+    assert router.candidates() == []
+    assert read_session_bind() is db.engine
+
+
+def test_down_replica_falls_back_to_primary(use_router):
+    replica = make_replica(StubEngine(error=ConnectionRefusedError("connection refused")))
+    router = use_router(replica)
+
+    asyncio.run(router.refresh())
+
+    assert not replica.healthy
+    assert replica.error == "connection refused"
+    assert read_session_bind() is db.engine
+
+
+def test_replica_behind_generation_is_skipped(use_router):
+    replica = make_replica(StubEngine(generation=4))
+    router = use_router(replica)
+
+    asyncio.run(router.refresh())
+
+    assert replica.healthy
+    assert router.candidates(4) == [replica]
+    assert router.candidates(5) == []
+    assert read_session_bind(5) is db.engine
+
+
+def test_replica_refusing_sessions_is_marked_down(use_router):
+    # Healthy at its last check, but nothing listens there now
+    engine = db.make_engine("postgresql+asyncpg://postgres@127.0.0.1:1/amazon", timeout=1)
+    replica = make_replica(engine)
+    replica.healthy = True
+    use_router(replica)
+
+    try:
+        assert read_session_bind() is db.engine
+        assert not replica.healthy
+        assert replica.error
+    finally:
+        asyncio.run(engine.dispose())
+
+
+def test_requests_do_not_wait_for_checks(use_router):
+    replica = make_replica(StubEngine(delay=60))
+    router = use_router(replica)
+
+    async def run():
+        router.start()
+        try:
+            session = await asyncio.wait_for(db.open_read_session(), timeout=1)
+            await session.close()
+            return session.bind
+        finally:
+            await router.stop()
+
+    # Not checked yet, so the primary serves the read
+    assert asyncio.run(run()) is db.engine
+    assert replica.checked_at is None
+
+
+def test_background_checks_update_replica_state(use_router):
+    replica = make_replica(StubEngine(generation=7))
+    router = use_router(replica)
+
+    async def run():
+        router.start()
+        try:
+            for _ in range(10):
+                if replica.checked_at is not None:
+                    break
+                await asyncio.sleep(0)
+        finally:
+            await router.stop()
+
+    asyncio.run(run())
+
+    assert replica.healthy
+    assert replica.generation == 7
+    assert router._task is None
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import re
+import sys
+from pathlib import Path
+from typing import AsyncIterator, Callable, IO, List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Number of ASINs read and checked against the database at a time
+ASIN_CHUNK_SIZE = int(os.getenv("ASIN_CHUNK_SIZE") or "1000")
+
+SAMPLE_ASINS_FILE = Path(__file__).parent / "samples" / "asins.txt"
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$")
+
+
+def _read_chunk(f: IO[str], size: int) -> List[str]:
+    chunk = []
+    while len(chunk) < size:
+        line = f.readline()
+        if not line:
+            break
+        asin = line.strip()
+        if asin:
+            chunk.append(asin)
+    return chunk
+
+
+async def iter_lines(f: IO[str], chunk_size: int = ASIN_CHUNK_SIZE) -> AsyncIterator[List[str]]:
+    """Yield ASINs from a line-oriented stream in chunks, without blocking the loop."""
+    while True:
+        chunk = await asyncio.to_thread(_read_chunk, f, chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def iter_file(path: Path, chunk_size: int = ASIN_CHUNK_SIZE) -> AsyncIterator[List[str]]:
+    """Yield ASINs from a file with one ASIN per line."""
+    with open(path, "r") as f:
+        async for chunk in iter_lines(f, chunk_size):
+            yield chunk
+
+
+async def iter_list(asins: List[str], chunk_size: int = ASIN_CHUNK_SIZE) -> AsyncIterator[List[str]]:
+    """Yield an in-memory list of ASINs in chunks."""
+    for start in range(0, len(asins), chunk_size):
+        yield asins[start:start + chunk_size]
+
+
+async def iter_table(
+    session_factory: Callable[[], AsyncSession],
+    table: str,
+    column: str = "asin",
+    chunk_size: int = ASIN_CHUNK_SIZE,
+) -> AsyncIterator[List[str]]:
+    """
+    Yield ASINs from a database table using keyset pagination.
+
+    Uses its own session so that commits made by the writer never invalidate
+    the read position.
+    """
+    if not _IDENTIFIER.match(table) or not _IDENTIFIER.match(column):
+        raise ValueError(f"Invalid ASIN source table: {table}:{column}")
+
+    first_query = text(f"SELECT {column} AS asin FROM {table} ORDER BY {column} LIMIT :limit")
+    next_query = text(f"""
+        SELECT {column} AS asin
+        FROM {table}
+        WHERE {column} > :after
+        ORDER BY {column}
+        LIMIT :limit
+    """)
+
+    after = None
+    async with session_factory() as session:
+        while True:
+            if after is None:
+                result = await session.execute(first_query, {"limit": chunk_size})
+            else:
+                result = await session.execute(next_query, {"after": after, "limit": chunk_size})
+            chunk = [row.asin for row in result.fetchall() if row.asin]
+            await session.rollback()
+            if not chunk:
+                return
+            after = chunk[-1]
+            yield chunk
+
+
+def open_asin_source(
+    spec: Optional[str],
+    session_factory: Callable[[], AsyncSession],
+    chunk_size: int = ASIN_CHUNK_SIZE,
+) -> Optional[AsyncIterator[List[str]]]:
+    """
+    Open an ASIN source as an async iterator of chunks.
+
+    spec can be "-" (stdin), "table:<name>[:<column>]", "file:<path>" or a
+    plain path. Without a spec, TARGET_ASINS and then samples/asins.txt are
+    used. Returns None when no source is configured.
+    """
+    spec = (spec or os.getenv("ASIN_SOURCE", "")).strip()
+
+    if not spec:
+        target_asins_env = os.getenv("TARGET_ASINS", "").strip()
+        if target_asins_env:
+            asins = [asin.strip() for asin in target_asins_env.split(",") if asin.strip()]
+            return iter_list(asins, chunk_size)
+        if SAMPLE_ASINS_FILE.exists():
+            return iter_file(SAMPLE_ASINS_FILE, chunk_size)
+        return None
+
+    if spec in ("-", "stdin"):
+        return iter_lines(sys.stdin, chunk_size)
+
+    if spec.startswith("table:"):
+        table, _, column = spec[len("table:"):].partition(":")
+        return iter_table(session_factory, table, column or "asin", chunk_size)
+
+    if spec.startswith("file:"):
+        spec = spec[len("file:"):]
+    return iter_file(Path(spec), chunk_size)
+
+
+async def filter_new_asins(session: AsyncSession, asins: List[str]) -> List[str]:
+    """
+    Return the ASINs from one chunk that are not in products yet.
+
+    The chunk is staged in a session-local temp table and filtered with an
+    anti-join, so the check costs the same regardless of catalog size.
+    """
+    if not asins:
+        return []
+
+    await session.execute(text("""
+        CREATE TEMP TABLE IF NOT EXISTS asin_chunk (asin text PRIMARY KEY)
+    """))
+    await session.execute(text("TRUNCATE asin_chunk"))
+    await session.execute(text("""
+        INSERT INTO asin_chunk (asin)
+        SELECT DISTINCT unnest(CAST(:asins AS text[]))
+        ON CONFLICT DO NOTHING
+    """), {"asins": asins})
+
+    result = await session.execute(text("""
+        SELECT c.asin
+        FROM asin_chunk c
+        WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.asin = c.asin)
+    """))
+    new_asins = {row.asin for row in result.fetchall()}
+    return [asin for asin in asins if asin in new_asins]
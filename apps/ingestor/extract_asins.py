@@ -6,9 +6,10 @@ This uses ScrapingBee to get ASINs from Amazon pages.
 import os
 import re
 import sys
+import asyncio
 from pathlib import Path
 from dotenv import load_dotenv
-from scrapingbee import ScrapingBeeClient
+from provider_scrapingbee import api_get, new_client
 
 load_dotenv(Path(__file__).parent.parent.parent / '.env')
 
@@ -28,6 +29,11 @@ def extract_asin_from_url(url):
     return None
 
 
+async def search(api_key, url, params):
+    async with new_client() as client:
+        return await api_get(client, api_key, url, params)
+
+
 def get_asins_from_search(search_query, max_results=20):
     """Get ASINs from Amazon search results."""
     api_key = os.getenv("SCRAPINGBEE_API_KEY")
@@ -35,7 +41,6 @@ def get_asins_from_search(search_query, max_results=20):
         print("❌ SCRAPINGBEE_API_KEY not found")
         return []
     
-    client = ScrapingBeeClient(api_key=api_key)
     url = f"https://www.amazon.com/s?k={search_query.replace(' ', '+')}"
     
     ai_extract_rules = {
@@ -54,7 +59,7 @@ def get_asins_from_search(search_query, max_results=20):
     
     try:
         print(f"🔍 Searching Amazon for: '{search_query}'")
-        response = client.get(url, params=ai_params)
+        response = asyncio.run(search(api_key, url, ai_params))
         
         if response.status_code != 200:
             print(f"❌ Failed: HTTP {response.status_code}")
@@ -0,0 +1,46 @@
+from typing import Optional
+from selectolax.lexbor import LexborHTMLParser
+from product_selectors import PRODUCT_SELECTORS, clean_product_fields, parse_price
+
+
+def extract_fields(html: str) -> dict:
+    """
+    Resolve every field of the selector table against static HTML.
+
+    Mirrors the in-browser extraction in provider_scraper, using element text
+    content instead of rendered innerText.
+    """
+    tree = LexborHTMLParser(html)
+    out = {}
+
+    for name, spec in PRODUCT_SELECTORS.items():
+        out[name] = None
+        for selector in spec["selectors"]:
+            try:
+                matches = tree.css(selector)
+            except Exception:
+                continue
+            if not matches:
+                continue
+
+            node = matches[-1] if spec.get("pick") == "last" else matches[0]
+            if "attrs" in spec:
+                value = next((node.attributes.get(attr) for attr in spec["attrs"] if node.attributes.get(attr)), None)
+            else:
+                value = " ".join(node.text(deep=True, separator=" ").split())
+            if not value:
+                continue
+            if "contains" in spec and not any(word in value.lower() for word in spec["contains"]):
+                continue
+            if spec.get("numeric") and parse_price(value) is None:
+                continue
+
+            out[name] = value
+            break
+
+    return out
+
+
+def parse_product_html(html: str) -> Optional[dict]:
+    """Parse a product page into ProductIngest keyword arguments (without asin), or None."""
+    return clean_product_fields(extract_fields(html))
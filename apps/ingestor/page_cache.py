@@ -0,0 +1,179 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+# Optional on-disk store of raw fetched pages; disabled when unset
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR", "").strip()
+# Oldest pages are evicted once the compressed blobs exceed this size
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES") or str(2 * 1024 ** 3))
+# Eviction frees space down to this fraction of the limit, so it runs in batches
+PAGE_CACHE_LOW_WATER_RATIO = float(os.getenv("PAGE_CACHE_LOW_WATER_RATIO") or "0.9")
+
+TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S%fZ"
+
+# Running size of the blob store, computed on first use. Pages are stored from
+# several asyncio.to_thread workers, so it is only touched under _lock.
+_total_bytes: Optional[int] = None
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    asin: str
+    fetched_at: datetime
+    kind: str  # "html" (rendered page) or "scrapingbee" (AI extraction JSON)
+    digest: str
+
+
+def is_enabled() -> bool:
+    return bool(PAGE_CACHE_DIR)
+
+
+def _root() -> Path:
+    return Path(PAGE_CACHE_DIR)
+
+
+def _blob_path(digest: str) -> Path:
+    return _root() / "blobs" / digest[:2] / f"{digest}.gz"
+
+
+def _index_dir(asin: str) -> Path:
+    return _root() / "index" / asin[-2:] / asin
+
+
+def _blob_sizes():
+    for path in (_root() / "blobs").glob("*/*.gz"):
+        try:
+            yield path, path.stat()
+        except FileNotFoundError:
+            continue
+
+
+def store_page(
+    asin: str,
+    kind: str,
+    content: Union[str, bytes],
+    fetched_at: Optional[datetime] = None,
+) -> Optional[str]:
+    """
+    Store a raw page and index it by ASIN and fetch time.
+
+    Blobs are gzip-compressed and addressed by the SHA-256 of the raw
+    content, so identical pages are stored once. Returns the digest, or
+    None when the cache is disabled.
+    """
+    global _total_bytes
+    if not is_enabled():
+        return None
+
+    raw = content.encode("utf-8") if isinstance(content, str) else content
+    digest = hashlib.sha256(raw).hexdigest()
+    fetched_at = fetched_at or datetime.now(timezone.utc)
+
+    blob = _blob_path(digest)
+    with _lock:
+        stored = blob.exists()
+        if stored:
+            # Refresh so eviction treats the page as recently seen
+            os.utime(blob)
+
+    if not stored:
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        # Unique per writer: two workers may store the same page at once
+        with tempfile.NamedTemporaryFile(dir=blob.parent, prefix=f"{digest}.", suffix=".tmp", delete=False) as tmp:
+            tmp.write(gzip.compress(raw, compresslevel=6))
+        with _lock:
+            stored = blob.exists()
+            os.replace(tmp.name, blob)
+            if not stored and _total_bytes is not None:
+                _total_bytes += blob.stat().st_size
+
+    index_dir = _index_dir(asin)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    (index_dir / f"{fetched_at.strftime(TIMESTAMP_FORMAT)}.{kind}").write_text(digest)
+
+    evict_if_needed()
+    return digest
+
+
+def evict_if_needed(max_bytes: int = PAGE_CACHE_MAX_BYTES, low_water_ratio: float = PAGE_CACHE_LOW_WATER_RATIO) -> int:
+    """
+    Once the store exceeds `max_bytes`, delete the least recently stored
+    blobs until it is back under `low_water_ratio` of it, and drop the index
+    entries that pointed at them. Returns bytes freed.
+    """
+    global _total_bytes
+    with _lock:
+        if _total_bytes is None:
+            _total_bytes = sum(stat.st_size for _, stat in _blob_sizes())
+        if _total_bytes <= max_bytes:
+            return 0
+
+        target = int(max_bytes * low_water_ratio)
+        freed = 0
+        evicted = set()
+        for path, stat in sorted(_blob_sizes(), key=lambda item: item[1].st_mtime):
+            if _total_bytes - freed <= target:
+                break
+            path.unlink(missing_ok=True)
+            freed += stat.st_size
+            evicted.add(path.name[:-len(".gz")])
+
+        _total_bytes -= freed
+
+    _prune_index(evicted)
+    return freed
+
+
+def _prune_index(digests: set):
+    """Delete the index entries pointing at any of `digests`."""
+    index_root = _root() / "index"
+    if not digests or not index_root.exists():
+        return
+
+    for asin_dir in index_root.glob("*/*"):
+        for ref in list(asin_dir.iterdir()):
+            try:
+                if ref.read_text().strip() in digests:
+                    ref.unlink()
+            except FileNotFoundError:
+                continue
+
+
+def iter_entries(latest_only: bool = True) -> Iterator[CacheEntry]:
+    """
+    Yield cached pages, optionally only the most recent per ASIN.
+
+    Index entries whose blob has been evicted are skipped.
+    """
+    index_root = _root() / "index"
+    if not is_enabled() or not index_root.exists():
+        return
+
+    for asin_dir in sorted(index_root.glob("*/*")):
+        # Newest first when only the latest is wanted, oldest first otherwise
+        refs = sorted(asin_dir.iterdir(), reverse=latest_only)
+        for ref in refs:
+            stamp, _, kind = ref.name.partition(".")
+            try:
+                digest = ref.read_text().strip()
+            except FileNotFoundError:
+                continue
+            if not _blob_path(digest).exists():
+                continue
+
+            fetched_at = datetime.strptime(stamp, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+            yield CacheEntry(asin=asin_dir.name, fetched_at=fetched_at, kind=kind, digest=digest)
+            if latest_only:
+                break
+
+
+def load_page(entry: CacheEntry) -> bytes:
+    """Return the raw content of a cached page."""
+    return gzip.decompress(_blob_path(entry.digest).read_bytes())
@@ -0,0 +1,115 @@
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import List
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Monthly partitions kept ready ahead of the current (UTC) month
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD") or "3")
+# Whole months of rows kept before the current month; 0 keeps everything
+OFFERS_RETENTION_MONTHS = int(os.getenv("OFFERS_RETENTION_MONTHS") or "0")
+OFFER_HISTORY_RETENTION_MONTHS = int(os.getenv("OFFER_HISTORY_RETENTION_MONTHS") or "0")
+# "detach" keeps expired partitions as standalone tables for archiving, "drop" deletes them
+PARTITION_RETENTION_MODE = (os.getenv("PARTITION_RETENTION_MODE") or "detach").lower()
+
+PARTITIONED_TABLES = {
+    "offers": OFFERS_RETENTION_MONTHS,
+    "offer_history": OFFER_HISTORY_RETENTION_MONTHS,
+}
+
+IS_PARTITIONED_QUERY = text("""
+    SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:parent))
+""")
+
+# Defined in db/init.sql; moves matching rows out of the default partition
+ENSURE_PARTITION_QUERY = text("SELECT ensure_monthly_partition(:parent, :month)")
+
+LIST_PARTITIONS_QUERY = text("""
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = to_regclass(:parent)
+    ORDER BY c.relname
+""")
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def current_month() -> date:
+    return datetime.now(timezone.utc).date().replace(day=1)
+
+
+def partition_month(parent: str, name: str):
+    """Month covered by a partition named like offers_y2024m05, or None for others (e.g. the default)."""
+    match = re.fullmatch(re.escape(parent) + r"_y(\d{4})m(\d{2})", name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+async def expired_partitions(session: AsyncSession, parent: str, retention_months: int) -> List[str]:
+    """Partitions of `parent` whose whole month is older than the retention window."""
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(current_month(), -retention_months)
+    names = (await session.execute(LIST_PARTITIONS_QUERY, {"parent": parent})).scalars().all()
+    expired = []
+    for name in names:
+        month = partition_month(parent, name)
+        if month and month < cutoff:
+            expired.append(name)
+    return expired
+
+
+async def maintain_partitions(
+    session: AsyncSession,
+    months_ahead: int = PARTITION_MONTHS_AHEAD,
+    mode: str = PARTITION_RETENTION_MODE,
+    dry_run: bool = False,
+):
+    """
+    Create monthly partitions of offers and offer_history ahead of time and
+    detach or drop the ones past their retention, then commit.
+
+    Rows older than the retention window that ended up in a default
+    partition are deleted in the same pass.
+    """
+    if mode not in ("detach", "drop"):
+        raise ValueError(f"Unknown partition retention mode: {mode!r} (use 'detach' or 'drop')")
+
+    this_month = current_month()
+    for parent, retention_months in PARTITIONED_TABLES.items():
+        if not await session.scalar(IS_PARTITIONED_QUERY, {"parent": parent}):
+            print(f"⚠ {parent} is not partitioned; apply db/migrations/004_partition_offers.sql first")
+            continue
+
+        for offset in range(months_ahead + 1):
+            month = add_months(this_month, offset)
+            if dry_run:
+                print(f"  would ensure {parent} partition for {month:%Y-%m}")
+                continue
+            created = await session.scalar(ENSURE_PARTITION_QUERY, {"parent": parent, "month": month})
+            if created:
+                print(f"🧱 Created partition {created}")
+
+        for name in await expired_partitions(session, parent, retention_months):
+            if dry_run:
+                print(f"  would {mode} expired partition {name}")
+            elif mode == "drop":
+                await session.execute(text(f'DROP TABLE "{name}"'))
+                print(f"🗑️  Dropped expired partition {name}")
+            else:
+                await session.execute(text(f'ALTER TABLE "{parent}" DETACH PARTITION "{name}"'))
+                print(f"📦 Detached expired partition {name}")
+
+        if retention_months > 0 and not dry_run:
+            cutoff = datetime.combine(add_months(this_month, -retention_months), datetime.min.time(), timezone.utc)
+            result = await session.execute(
+                text(f'DELETE FROM "{parent}_default" WHERE fetched_at < :cutoff'), {"cutoff": cutoff}
+            )
+            if result.rowcount:
+                print(f"🗑️  Deleted {result.rowcount} expired rows from {parent}_default")
+
+    await session.commit()
@@ -0,0 +1,112 @@
+import asyncio
+import os
+from typing import AsyncIterator, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from asin_source import filter_new_asins
+from writer import INGEST_BATCH_SIZE, write_products
+
+# Longest a fetched product waits before its micro-batch is committed
+INGEST_COMMIT_INTERVAL_SECONDS = float(os.getenv("INGEST_COMMIT_INTERVAL_SECONDS") or "15")
+# Products buffered between the fetch and write stages
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE") or "1000")
+
+_DONE = object()
+
+
+class ProviderFailed(Exception):
+    """Raised after committing everything fetched before the provider failed."""
+
+
+async def _commit_batch(session: AsyncSession, batch: List, only_new: bool) -> int:
+    """Write one micro-batch of products and commit it."""
+    new_products = batch
+    if only_new:
+        # Filter out products that already exist (double-check after scraping)
+        new_asins = set(await filter_new_asins(session, [p.asin for p in batch]))
+        new_products = [p for p in batch if p.asin in new_asins]
+
+    if len(new_products) < len(batch):
+        skipped = len(batch) - len(new_products)
+        print(f"⏭️  Skipping {skipped} products that were added during scraping")
+
+    written = 0
+    if new_products:
+        # Products, offers and history changes in a handful of statements
+        written = await write_products(session, new_products)
+        for product in new_products:
+            print(f"  ✓ Ingested {product.asin}: {product.title[:50]}...")
+
+    await session.commit()
+    return written
+
+
+async def write_stream(
+    products: AsyncIterator,
+    session: AsyncSession,
+    batch_size: int = INGEST_BATCH_SIZE,
+    interval: float = INGEST_COMMIT_INTERVAL_SECONDS,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    only_new: bool = True,
+) -> int:
+    """
+    Consume products through a bounded queue and commit them in micro-batches.
+
+    Fetching and writing overlap, and a micro-batch is committed every
+    `batch_size` products or `interval` seconds, whichever comes first. A
+    provider failure only loses products that were never fetched: everything
+    already buffered is committed before ProviderFailed is raised. With
+    only_new, products whose ASIN is already stored are dropped.
+
+    Returns the number of products written.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def produce():
+        try:
+            async for product in products:
+                await queue.put(product)
+        except Exception as e:
+            failure = ProviderFailed(f"Provider failed: {e}")
+            failure.__cause__ = e
+            await queue.put(failure)
+            return
+        await queue.put(_DONE)
+
+    producer = asyncio.create_task(produce())
+    getter = None
+    buffer = []
+    written = 0
+    item = None
+    deadline = loop.time() + interval
+
+    try:
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter}, timeout=max(0.0, deadline - loop.time()))
+
+            if getter in done:
+                item, getter = getter.result(), None
+                if item is _DONE or isinstance(item, ProviderFailed):
+                    break
+                buffer.append(item)
+
+            if len(buffer) >= batch_size or (loop.time() >= deadline and buffer):
+                batch, buffer = buffer, []
+                written += await _commit_batch(session, batch, only_new)
+            if loop.time() >= deadline:
+                deadline = loop.time() + interval
+
+        if buffer:
+            written += await _commit_batch(session, buffer, only_new)
+    finally:
+        if getter is not None:
+            getter.cancel()
+        producer.cancel()
+
+    if isinstance(item, ProviderFailed):
+        print(f"⚠ Committed {written} products before the provider failed")
+        raise item
+
+    return written
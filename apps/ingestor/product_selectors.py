@@ -0,0 +1,109 @@
+import re
+from typing import Optional
+
+# Declarative selector table for Amazon product pages.
+#
+# Each field lists CSS selectors tried in order; the first one that yields a
+# value wins. By default the element's text is used; "attrs" reads the first
+# non-empty attribute instead, "pick": "last" uses the last match instead of
+# the first, "contains" only accepts text containing one of the words, and
+# "numeric" only accepts text that parse_price can read as a number.
+PRODUCT_SELECTORS = {
+    "title": {
+        "selectors": [
+            '#productTitle',
+            'h1.a-size-large',
+            'span#productTitle',
+            'h1[data-automation-id="title"]',
+            'h1',
+        ],
+    },
+    "price": {
+        "selectors": [
+            'span.a-price-whole',
+            '.a-price .a-offscreen',
+            '#priceblock_ourprice',
+            '#priceblock_dealprice',
+            'span.a-price-symbol + span',
+            '[data-a-color="price"] .a-offscreen',
+            '[data-a-color="price"]',
+        ],
+        "numeric": True,
+    },
+    "availability": {
+        "selectors": [
+            '#availability span',
+            '#availability-feature_feature_div span',
+            '.a-section.a-spacing-none.aok-align-center span',
+            '[data-asin] + div span',
+        ],
+        "contains": ['stock', 'available', 'ships'],
+    },
+    "brand": {
+        "selectors": [
+            '#brand',
+            'a#brand',
+            'tr.po-brand td span',
+            '[data-feature-name="bylineInfo"] a',
+        ],
+    },
+    "image_url": {
+        "selectors": [
+            '#landingImage',
+            '#imgBlkFront',
+            '#main-image',
+            'img[data-a-dynamic-image]',
+        ],
+        "attrs": ['src', 'data-src'],
+    },
+    "category": {
+        # Usually the last breadcrumb is the category
+        "selectors": ['#wayfinding-breadcrumbs_feature_div a'],
+        "pick": "last",
+    },
+    "seller": {
+        "selectors": ['#sellerProfileTriggerId', '#merchant-info a'],
+    },
+}
+
+# Elements whose presence means the product content has rendered
+READY_SELECTOR = ", ".join(PRODUCT_SELECTORS["title"]["selectors"][:4])
+
+
+def parse_price(price_text: Optional[str]) -> Optional[float]:
+    """Parse a displayed price such as '$1,299.99' into a float."""
+    if not price_text:
+        return None
+    # Remove currency symbols and extract number
+    price_clean = re.sub(r'[^\d.]', '', price_text)
+    try:
+        return float(price_clean) if price_clean else None
+    except ValueError:
+        return None
+
+
+def clean_product_fields(raw: dict) -> Optional[dict]:
+    """
+    Turn raw extracted field values into ProductIngest keyword arguments.
+
+    Returns None when no usable title was found.
+    """
+    title = (raw.get("title") or "").strip()
+    if len(title) < 5:
+        return None
+
+    brand = (raw.get("brand") or "").strip() or None
+    if brand:
+        # Remove "Visit the" prefix if present
+        brand = re.sub(r'^Visit the\s+', '', brand, flags=re.IGNORECASE)
+
+    return {
+        "title": title,
+        "brand": brand,
+        "category": (raw.get("category") or "").strip() or None,
+        "image_url": (raw.get("image_url") or "").strip() or None,
+        "price": parse_price(raw.get("price")),
+        "currency": "USD",
+        "availability": (raw.get("availability") or "").strip() or "Check availability",
+        "seller": (raw.get("seller") or "").strip() or "Amazon.com",
+    }
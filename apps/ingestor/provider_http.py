@@ -0,0 +1,156 @@
+import os
+import asyncio
+import time
+from typing import AsyncIterator, List, Optional
+from urllib.parse import urlparse
+import httpx
+from pydantic import BaseModel
+import page_cache
+from html_parser import parse_product_html
+from pacing import HostPacer
+
+
+# Overridable so the provider can be pointed at a local stand-in server
+HTTP_BASE_URL = (os.getenv("HTTP_BASE_URL") or "https://www.amazon.com").rstrip("/")
+# Product pages fetched in parallel over the pooled client
+HTTP_CONCURRENCY = int(os.getenv("HTTP_CONCURRENCY") or "8")
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS") or "20")
+# Minimum spacing between requests to the same host, plus random jitter
+HTTP_HOST_DELAY_SECONDS = float(os.getenv("HTTP_HOST_DELAY_SECONDS") or "0.5")
+HTTP_HOST_JITTER_SECONDS = float(os.getenv("HTTP_HOST_JITTER_SECONDS") or "0.5")
+# Re-scrape pages that could not be parsed with the Playwright provider
+HTTP_FALLBACK_TO_BROWSER = os.getenv("HTTP_FALLBACK_TO_BROWSER", "true").lower() in ("1", "true", "yes")
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'DNT': '1',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Pooled keep-alive client, kept warm across cycles by the daemon
+_client: Optional[httpx.AsyncClient] = None
+
+
+class ProductIngest(BaseModel):
+    asin: str
+    title: str
+    brand: Optional[str] = None
+    category: Optional[str] = None
+    image_url: Optional[str] = None
+    price: Optional[float] = None
+    currency: str = "USD"
+    availability: Optional[str] = None
+    seller: Optional[str] = None
+
+
+def new_client() -> httpx.AsyncClient:
+    """Create a keep-alive HTTP client sized to the concurrency limit."""
+    return httpx.AsyncClient(
+        headers=HEADERS,
+        timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS),
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=HTTP_CONCURRENCY,
+            max_keepalive_connections=HTTP_CONCURRENCY,
+        ),
+    )
+
+
+async def start_client():
+    """Open the shared HTTP client reused by fetch_products until close_client()."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = new_client()
+
+
+async def close_client():
+    """Close the shared HTTP client."""
+    global _client
+    if _client:
+        await _client.aclose()
+        _client = None
+
+
+async def fetch_product_page(client: httpx.AsyncClient, asin: str) -> Optional[ProductIngest]:
+    """Fetch and parse a single product page. Returns None if it can't be parsed."""
+    url = f"{HTTP_BASE_URL}/dp/{asin}"
+
+    try:
+        response = await client.get(url)
+        if response.status_code != 200:
+            print(f"  ✗ Failed to fetch {asin}: HTTP {response.status_code}")
+            return None
+
+        html = response.text
+        if page_cache.is_enabled():
+            await asyncio.to_thread(page_cache.store_page, asin, "html", html)
+
+        # Parsing is CPU-bound; keep it off the event loop
+        fields = await asyncio.to_thread(parse_product_html, html)
+        if not fields:
+            print(f"  ⚠ Could not parse {asin} (likely a robot check or JS-only page)")
+            return None
+
+        return ProductIngest(asin=asin, **fields)
+
+    except Exception as e:
+        print(f"  ✗ Error fetching {asin}: {str(e)}")
+        return None
+
+
+async def iter_products(asins: Optional[List[str]] = None) -> AsyncIterator[ProductIngest]:
+    """
+    Fetch product pages over plain HTTP, yielding each product as soon as it is parsed.
+
+    Pages that can't be parsed are re-scraped with the Playwright provider
+    when HTTP_FALLBACK_TO_BROWSER is enabled.
+    """
+    if not asins:
+        print("⚠ No ASINs provided for scraping")
+        return
+
+    owns_client = _client is None or _client.is_closed
+    client = new_client() if owns_client else _client
+    semaphore = asyncio.Semaphore(HTTP_CONCURRENCY)
+    pacer = HostPacer(HTTP_HOST_DELAY_SECONDS, HTTP_HOST_JITTER_SECONDS)
+    host = urlparse(HTTP_BASE_URL).hostname or ""
+    unparsed = []
+
+    async def fetch_one(i: int, asin: str) -> Optional[ProductIngest]:
+        async with semaphore:
+            await pacer.wait(host)
+            started = time.perf_counter()
+            product = await fetch_product_page(client, asin)
+            latency = time.perf_counter() - started
+        if product:
+            print(f"  [{i}/{len(asins)}] ✓ {asin} in {latency:.2f}s: {product.title[:60]}...")
+        else:
+            unparsed.append(asin)
+        return product
+
+    print(f"📦 Fetching {len(asins)} products over HTTP ({HTTP_CONCURRENCY} at a time)...")
+    tasks = [asyncio.create_task(fetch_one(i, asin)) for i, asin in enumerate(asins, 1)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            product = await next_done
+            if product:
+                yield product
+    finally:
+        for task in tasks:
+            task.cancel()
+        if owns_client:
+            await client.aclose()
+
+    if unparsed and HTTP_FALLBACK_TO_BROWSER:
+        print(f"🌐 Falling back to the browser for {len(unparsed)} unparsed pages")
+        # Imported lazily so Playwright is only loaded when a fallback is needed
+        from provider_scraper import iter_products as iter_browser_products
+        async for product in iter_browser_products(unparsed):
+            yield ProductIngest(**product.model_dump())
+
+
+async def fetch_products(asins: Optional[List[str]] = None) -> List[ProductIngest]:
+    """Fetch products over plain HTTP, falling back to the browser when needed."""
+    return [product async for product in iter_products(asins)]
@@ -1,7 +1,7 @@
 import json
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 from pydantic import BaseModel
 
 
@@ -38,3 +38,8 @@ def fetch_products(asins: Optional[List[str]] = None) -> List[ProductIngest]:
 
     return products
 
+
+async def iter_products(asins: Optional[List[str]] = None) -> AsyncIterator[ProductIngest]:
+    """Async iterator over fetch_products, matching the streaming provider interface."""
+    for product in fetch_products(asins):
+        yield product
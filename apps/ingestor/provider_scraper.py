@@ -1,9 +1,35 @@
-import re
+import os
 import asyncio
 import time
-from typing import List, Optional
-from playwright.async_api import async_playwright, Browser, Page
+from typing import AsyncIterator, List, Optional, Tuple
+from urllib.parse import urlparse
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Route
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from pydantic import BaseModel
+import page_cache
+from pacing import HostPacer
+from product_selectors import PRODUCT_SELECTORS, READY_SELECTOR, clean_product_fields
+
+
+# Pages scraped in parallel, each on its own browser context
+SCRAPER_CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY") or "4")
+# Contexts are recycled after this many pages (and after any failed page)
+SCRAPER_PAGES_PER_CONTEXT = int(os.getenv("SCRAPER_PAGES_PER_CONTEXT") or "20")
+# Minimum spacing between page loads on the same host, plus random jitter
+SCRAPER_HOST_DELAY_SECONDS = float(os.getenv("SCRAPER_HOST_DELAY_SECONDS") or "1.0")
+SCRAPER_HOST_JITTER_SECONDS = float(os.getenv("SCRAPER_HOST_JITTER_SECONDS") or "1.0")
+
+# How long to wait for the product title to render before extracting anyway
+SCRAPER_READY_TIMEOUT_MS = int(os.getenv("SCRAPER_READY_TIMEOUT_MS") or "10000")
+# Abort requests that don't contribute to extraction
+SCRAPER_BLOCK_RESOURCES = os.getenv("SCRAPER_BLOCK_RESOURCES", "true").lower() in ("1", "true", "yes")
+
+AMAZON_HOST = "www.amazon.com"
+
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+# Only Amazon's own hosts are loaded; of those, metrics and ad endpoints are dropped too
+FIRST_PARTY_DOMAINS = ("amazon.com", "media-amazon.com", "ssl-images-amazon.com", "images-amazon.com")
+BLOCKED_HOST_MARKERS = ("fls-", "unagi", "aax-", "amazon-adsystem", "device-metrics")
 
 
 class ProductIngest(BaseModel):
@@ -18,219 +44,143 @@ class ProductIngest(BaseModel):
     seller: Optional[str] = None
 
 
+# Runs in the page: resolves every field of the selector table in one round trip
+EXTRACT_FIELDS_JS = """
+(fields) => {
+  const out = {};
+  for (const [name, spec] of Object.entries(fields)) {
+    out[name] = null;
+    for (const selector of spec.selectors) {
+      let matches;
+      try {
+        matches = document.querySelectorAll(selector);
+      } catch (e) {
+        continue;
+      }
+      if (!matches.length) continue;
+      const el = spec.pick === 'last' ? matches[matches.length - 1] : matches[0];
+      let value = null;
+      if (spec.attrs) {
+        for (const attr of spec.attrs) {
+          value = el.getAttribute(attr);
+          if (value) break;
+        }
+      } else {
+        value = (el.innerText || el.textContent || '').trim();
+      }
+      if (!value) continue;
+      if (spec.contains && !spec.contains.some((word) => value.toLowerCase().includes(word))) continue;
+      if (spec.numeric) {
+        // Same rule as parse_price: strip everything but digits and dots
+        const digits = value.replace(/[^\d.]/g, '');
+        if (!digits || Number.isNaN(Number(digits))) continue;
+      }
+      out[name] = value;
+      break;
+    }
+  }
+  return out;
+}
+"""
+
+
 async def scrape_product_page(page: Page, asin: str) -> Optional[ProductIngest]:
     """Scrape a single product page by ASIN."""
     url = f"https://www.amazon.com/dp/{asin}"
     
     try:
-        await page.goto(url, wait_until="networkidle", timeout=30000)
-        await asyncio.sleep(2)  # Wait for dynamic content
-        
-        # Extract title
-        title_selectors = [
-            '#productTitle',
-            'h1.a-size-large',
-            'span#productTitle',
-            'h1[data-automation-id="title"]'
-        ]
-        title = None
-        for selector in title_selectors:
-            try:
-                title_elem = await page.wait_for_selector(selector, timeout=5000)
-                if title_elem:
-                    title = await title_elem.inner_text()
-                    title = title.strip()
-                    break
-            except:
-                continue
-        
-        if not title:
-            # Fallback: try to get any h1
-            h1_elem = await page.query_selector('h1')
-            if h1_elem:
-                title = await h1_elem.inner_text()
-                title = title.strip()
-        
-        if not title or len(title) < 5:
-            print(f"  ⚠ Could not extract title for {asin}")
-            return None
-        
-        # Extract price
-        price_selectors = [
-            'span.a-price-whole',
-            '.a-price .a-offscreen',
-            '#priceblock_ourprice',
-            '#priceblock_dealprice',
-            'span.a-price-symbol + span',
-            '[data-a-color="price"] .a-offscreen'
-        ]
-        price = None
-        price_text = None
-        for selector in price_selectors:
-            try:
-                price_elem = await page.query_selector(selector)
-                if price_elem:
-                    price_text = await price_elem.inner_text()
-                    # Remove currency symbols and extract number
-                    price_text = re.sub(r'[^\d.]', '', price_text)
-                    if price_text:
-                        price = float(price_text)
-                        break
-            except:
-                continue
-        
-        # Try to extract price from aria-label or data attributes
-        if not price:
-            price_elem = await page.query_selector('[data-a-color="price"]')
-            if price_elem:
-                price_attr = await price_elem.get_attribute('data-a-color')
-                price_text = await price_elem.inner_text()
-                price_text = re.sub(r'[^\d.]', '', price_text)
-                if price_text:
-                    try:
-                        price = float(price_text)
-                    except:
-                        pass
-        
-        # Extract availability
-        availability = None
-        availability_selectors = [
-            '#availability span',
-            '#availability-feature_feature_div span',
-            '.a-section.a-spacing-none.aok-align-center span',
-            '[data-asin] + div span'
-        ]
-        for selector in availability_selectors:
-            try:
-                avail_elem = await page.query_selector(selector)
-                if avail_elem:
-                    avail_text = await avail_elem.inner_text()
-                    if any(word in avail_text.lower() for word in ['stock', 'available', 'ships']):
-                        availability = avail_text.strip()
-                        break
-            except:
-                continue
-        
-        if not availability:
-            availability = "Check availability"
-        
-        # Extract brand
-        brand = None
-        brand_selectors = [
-            '#brand',
-            'a#brand',
-            'tr.po-brand td span',
-            '[data-feature-name="bylineInfo"] a'
-        ]
-        for selector in brand_selectors:
-            try:
-                brand_elem = await page.query_selector(selector)
-                if brand_elem:
-                    brand = await brand_elem.inner_text()
-                    brand = brand.strip()
-                    # Remove "Visit the" prefix if present
-                    brand = re.sub(r'^Visit the\s+', '', brand, flags=re.IGNORECASE)
-                    break
-            except:
-                continue
-        
-        # Extract image URL
-        image_url = None
-        image_selectors = [
-            '#landingImage',
-            '#imgBlkFront',
-            '#main-image',
-            'img[data-a-dynamic-image]'
-        ]
-        for selector in image_selectors:
-            try:
-                img_elem = await page.query_selector(selector)
-                if img_elem:
-                    image_url = await img_elem.get_attribute('src')
-                    if not image_url:
-                        image_url = await img_elem.get_attribute('data-src')
-                    if image_url:
-                        break
-            except:
-                continue
-        
-        # Extract category (breadcrumb)
-        category = None
+        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+
+        # Wait for the product content itself rather than a fixed sleep
         try:
-            breadcrumb = await page.query_selector('#wayfinding-breadcrumbs_feature_div')
-            if breadcrumb:
-                category_links = await breadcrumb.query_selector_all('a')
-                if category_links:
-                    # Usually the last breadcrumb is the category
-                    category_text = await category_links[-1].inner_text()
-                    category = category_text.strip()
-        except:
+            await page.wait_for_selector(READY_SELECTOR, timeout=SCRAPER_READY_TIMEOUT_MS)
+        except PlaywrightTimeoutError:
             pass
-        
-        # Extract seller (if available)
-        seller = None
-        try:
-            seller_elem = await page.query_selector('#sellerProfileTriggerId, #merchant-info a')
-            if seller_elem:
-                seller = await seller_elem.inner_text()
-                seller = seller.strip()
-            else:
-                # Check for "Ships from" or "Sold by"
-                seller_text = await page.inner_text('body')
-                if 'Sold by' in seller_text or 'Ships from' in seller_text:
-                    seller = "Amazon.com"
-        except:
-            seller = "Amazon.com"
-        
-        return ProductIngest(
-            asin=asin,
-            title=title,
-            brand=brand,
-            category=category,
-            image_url=image_url,
-            price=price,
-            currency="USD",
-            availability=availability,
-            seller=seller or "Amazon.com"
-        )
+
+        if page_cache.is_enabled():
+            # Kept even when extraction fails so the page can be re-parsed later
+            html = await page.content()
+            await asyncio.to_thread(page_cache.store_page, asin, "html", html)
+
+        raw = await page.evaluate(EXTRACT_FIELDS_JS, PRODUCT_SELECTORS)
+        fields = clean_product_fields(raw)
+
+        if not fields:
+            print(f"  ⚠ Could not extract title for {asin}")
+            return None
+
+        return ProductIngest(asin=asin, **fields)
     
     except Exception as e:
         print(f"  ✗ Error scraping {asin}: {str(e)}")
         return None
 
 
-async def fetch_products(asins: Optional[List[str]] = None) -> List[ProductIngest]:
-    """
-    Scrape products from Amazon by ASIN.
-    Requires ASINs to be provided.
-    """
-    if not asins:
-        print("⚠ No ASINs provided for scraping")
-        return []
-    
-    products = []
-    
-    async with async_playwright() as p:
-        # Launch browser with stealth settings
-        browser = await p.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--disable-dev-shm-usage',
-                '--no-sandbox'
-            ]
-        )
-        
-        # Create context with realistic user agent
-        context = await browser.new_context(
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            viewport={'width': 1920, 'height': 1080},
-            locale='en-US',
-            timezone_id='America/New_York'
-        )
-        
+def _is_blocked_request(resource_type: str, url: str) -> bool:
+    if resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    host = urlparse(url).hostname or ""
+    if any(marker in host for marker in BLOCKED_HOST_MARKERS):
+        return True
+    return not any(host == domain or host.endswith("." + domain) for domain in FIRST_PARTY_DOMAINS)
+
+
+async def _route_request(route: Route):
+    """Abort images, fonts, media and third-party/tracker requests."""
+    request = route.request
+    if _is_blocked_request(request.resource_type, request.url):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+BROWSER_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-dev-shm-usage',
+    '--no-sandbox'
+]
+
+# Long-lived browser kept warm across cycles by the daemon
+_playwright = None
+_browser: Optional[Browser] = None
+
+
+async def start_browser():
+    """Launch a shared Chromium instance reused by fetch_products until close_browser()."""
+    global _playwright, _browser
+    if _browser and _browser.is_connected():
+        return
+    if _playwright is None:
+        _playwright = await async_playwright().start()
+    _browser = await _playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+    print("🌐 Chromium started")
+
+
+async def close_browser():
+    """Close the shared Chromium instance."""
+    global _playwright, _browser
+    if _browser:
+        await _browser.close()
+        _browser = None
+    if _playwright:
+        await _playwright.stop()
+        _playwright = None
+
+
+async def new_scrape_page(browser: Browser) -> Tuple[BrowserContext, Page]:
+    """Open a fresh browser context and page with realistic browser settings."""
+    # Create context with realistic user agent
+    context = await browser.new_context(
+        user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        viewport={'width': 1920, 'height': 1080},
+        locale='en-US',
+        timezone_id='America/New_York'
+    )
+    try:
+        if SCRAPER_BLOCK_RESOURCES:
+            await context.route("**/*", _route_request)
         page = await context.new_page()
-        
+
         # Set extra headers to appear more like a real browser
         await page.set_extra_http_headers({
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -240,25 +190,142 @@ async def fetch_products(asins: Optional[List[str]] = None) -> List[ProductInges
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
-        
+    except BaseException:
+        await _close_context(context)
+        raise
+    return context, page
+
+
+async def _close_context(context: BrowserContext):
+    """Close a context, logging instead of raising if the browser already lost it."""
+    try:
+        await context.close()
+    except Exception as e:
+        print(f"  ⚠ Could not close browser context: {e}")
+
+
+async def _scrape_worker(
+    browser: Browser,
+    queue: asyncio.Queue,
+    pacer: HostPacer,
+    results: asyncio.Queue,
+    latencies: List[float],
+    total: int,
+):
+    """Scrape ASINs from the queue on one context, recycling it after K pages or an error."""
+    context = None
+    page = None
+    pages_used = 0
+
+    try:
+        while True:
+            try:
+                i, asin = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            if context is None or pages_used >= SCRAPER_PAGES_PER_CONTEXT:
+                if context:
+                    await _close_context(context)
+                    context = None
+                try:
+                    context, page = await new_scrape_page(browser)
+                except Exception as e:
+                    # Counts as a failed page; the next ASIN tries a new context
+                    print(f"  [{i}/{total}] ✗ Could not open a browser context for {asin}: {e}")
+                    continue
+                pages_used = 0
+
+            await pacer.wait(AMAZON_HOST)
+
+            started = time.perf_counter()
+            product = await scrape_product_page(page, asin)
+            latency = time.perf_counter() - started
+            latencies.append(latency)
+            pages_used += 1
+
+            if product:
+                await results.put(product)
+                print(f"  [{i}/{total}] ✓ {asin} in {latency:.1f}s: {product.title[:60]}...")
+            else:
+                print(f"  [{i}/{total}] ✗ Failed to scrape {asin} ({latency:.1f}s)")
+                # Start over with a clean context after a failure
+                await _close_context(context)
+                context = None
+    finally:
+        if context:
+            await _close_context(context)
+
+
+async def iter_with_browser(browser: Browser, asins: List[str]) -> AsyncIterator[ProductIngest]:
+    """Scrape ASINs concurrently on a bounded pool of contexts, yielding products as they finish."""
+    queue = asyncio.Queue()
+    for i, asin in enumerate(asins, 1):
+        queue.put_nowait((i, asin))
+
+    pacer = HostPacer(SCRAPER_HOST_DELAY_SECONDS, SCRAPER_HOST_JITTER_SECONDS)
+    results: asyncio.Queue = asyncio.Queue()
+    latencies: List[float] = []
+    workers = min(SCRAPER_CONCURRENCY, len(asins))
+
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(_scrape_worker(browser, queue, pacer, results, latencies, len(asins)))
+        for _ in range(workers)
+    ]
+    pool = asyncio.gather(*tasks)
+    # Wake the consumer once every worker is done, or as soon as one fails
+    pool.add_done_callback(lambda _: results.put_nowait(None))
+
+    try:
+        while (product := await results.get()) is not None:
+            yield product
+        await pool
+    finally:
+        # A failed worker or an early exit by the consumer must not leave the
+        # others scraping on the shared browser into the next cycle
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if pool.done() and not pool.cancelled():
+            pool.exception()
+
+    elapsed = time.perf_counter() - started
+    if latencies:
+        ordered = sorted(latencies)
+        p50 = ordered[len(ordered) // 2]
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        print(
+            f"  ⏱️  {len(latencies)} pages in {elapsed:.1f}s with {workers} workers "
+            f"(p50 {p50:.1f}s, p95 {p95:.1f}s, {len(latencies) / elapsed * 60:.1f} pages/min)"
+        )
+
+
+async def iter_products(asins: Optional[List[str]] = None) -> AsyncIterator[ProductIngest]:
+    """
+    Scrape products from Amazon by ASIN, yielding each as soon as it is scraped.
+    Requires ASINs to be provided. Uses the shared browser when start_browser()
+    was called, otherwise launches one for this call only.
+    """
+    if not asins:
+        print("⚠ No ASINs provided for scraping")
+        return
+
+    if _browser and _browser.is_connected():
+        async for product in iter_with_browser(_browser, asins):
+            yield product
+        return
+
+    async with async_playwright() as p:
+        # Launch browser with stealth settings
+        browser = await p.chromium.launch(headless=True, args=BROWSER_ARGS)
         try:
-            for i, asin in enumerate(asins, 1):
-                print(f"  [{i}/{len(asins)}] Scraping {asin}...")
-                product = await scrape_product_page(page, asin)
-                
-                if product:
-                    products.append(product)
-                    print(f"    ✓ Found: {product.title[:60]}...")
-                else:
-                    print(f"    ✗ Failed to scrape {asin}")
-                
-                # Rate limiting: wait between requests
-                if i < len(asins):
-                    delay = 3 + (i % 3)  # 3-5 seconds between requests
-                    await asyncio.sleep(delay)
-            
+            async for product in iter_with_browser(browser, asins):
+                yield product
         finally:
             await browser.close()
-    
-    return products
 
+
+async def fetch_products(asins: Optional[List[str]] = None) -> List[ProductIngest]:
+    """Scrape products from Amazon by ASIN."""
+    return [product async for product in iter_products(asins)]
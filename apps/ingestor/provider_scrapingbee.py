@@ -1,9 +1,23 @@
 import os
 import re
 import json
-from typing import List, Optional
-from scrapingbee import ScrapingBeeClient
+import asyncio
+import time
+from typing import AsyncIterator, List, Optional
+import httpx
 from pydantic import BaseModel
+import page_cache
+
+
+# Overridable so the provider can be pointed at a local stub server
+SCRAPINGBEE_API_URL = os.getenv("SCRAPINGBEE_API_URL") or "https://app.scrapingbee.com/api/v1/"
+# Concurrent requests allowed by the ScrapingBee plan
+SCRAPINGBEE_CONCURRENCY = int(os.getenv("SCRAPINGBEE_CONCURRENCY") or "5")
+# Per-request timeout; JS rendering with premium proxies can be slow
+SCRAPINGBEE_TIMEOUT_SECONDS = float(os.getenv("SCRAPINGBEE_TIMEOUT_SECONDS") or "90")
+
+# Pooled keep-alive client, kept warm across cycles by the daemon
+_client: Optional[httpx.AsyncClient] = None
 
 
 class ProductIngest(BaseModel):
@@ -34,7 +48,85 @@ def extract_asin_from_url(url: str) -> Optional[str]:
     return None
 
 
-def scrape_product_by_asin(client: ScrapingBeeClient, asin: str) -> Optional[ProductIngest]:
+def new_client() -> httpx.AsyncClient:
+    """Create a keep-alive HTTP client sized to the concurrency limit."""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(SCRAPINGBEE_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=SCRAPINGBEE_CONCURRENCY,
+            max_keepalive_connections=SCRAPINGBEE_CONCURRENCY,
+        ),
+    )
+
+
+async def start_client():
+    """Open the shared HTTP client reused by fetch_products until close_client()."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = new_client()
+
+
+async def close_client():
+    """Close the shared HTTP client."""
+    global _client
+    if _client:
+        await _client.aclose()
+        _client = None
+
+
+async def api_get(client: httpx.AsyncClient, api_key: str, url: str, params: dict) -> httpx.Response:
+    """Call the ScrapingBee HTML API for a target URL."""
+    query = {"api_key": api_key, "url": url}
+    for key, value in params.items():
+        if isinstance(value, bool):
+            query[key] = "true" if value else "false"
+        elif isinstance(value, (dict, list)):
+            query[key] = json.dumps(value)
+        else:
+            query[key] = value
+    return await client.get(SCRAPINGBEE_API_URL, params=query)
+
+
+def product_from_results(asin: str, results: dict) -> Optional[ProductIngest]:
+    """Build a product from ScrapingBee AI extraction results."""
+    # Extract price and convert to float
+    price = None
+    price_str = results.get("price", "")
+    if price_str:
+        # Remove currency symbols and extract number
+        price_clean = re.sub(r'[^\d.]', '', str(price_str))
+        try:
+            price = float(price_clean)
+        except (ValueError, TypeError):
+            pass
+
+    # Extract title
+    title = results.get("title", "").strip()
+    if not title or len(title) < 5:
+        print(f"  ⚠ No title found for {asin}")
+        return None
+
+    # Extract other fields
+    brand = results.get("brand", "").strip() or None
+    category = results.get("category", "").strip() or None
+    availability = results.get("availability", "Check availability").strip() or "Check availability"
+    seller = results.get("seller", "Amazon.com").strip() or "Amazon.com"
+    image_url = results.get("image_url", "").strip() or None
+
+    return ProductIngest(
+        asin=asin,
+        title=title,
+        brand=brand,
+        category=category,
+        image_url=image_url,
+        price=price,
+        currency="USD",
+        availability=availability,
+        seller=seller
+    )
+
+
+async def scrape_product_by_asin(client: httpx.AsyncClient, api_key: str, asin: str) -> Optional[ProductIngest]:
     """Scrape a single product page by ASIN using ScrapingBee."""
     url = f"https://www.amazon.com/dp/{asin}"
     
@@ -69,11 +161,10 @@ def scrape_product_by_asin(client: ScrapingBeeClient, asin: str) -> Optional[Pro
         },
     }
     
-    # ScrapingBee Python client: pass dict for ai_extract_rules (client handles stringification)
-    # For boolean params, use strings "true"/"false" or actual booleans
+    # Dicts and booleans are encoded by api_get
     ai_params = {
         "ai_query": "Extract product details including title, price, brand, category, availability, seller, and main product image URL",
-        "ai_extract_rules": ai_extract_rules,  # Pass as dict - client will stringify
+        "ai_extract_rules": ai_extract_rules,
         "render_js": True,  # Required for Amazon's dynamic content
         "premium_proxy": True,  # Helpful for Amazon (may require premium plan)
         "wait": 2000,  # Wait 2 seconds for JS to render
@@ -81,7 +172,7 @@ def scrape_product_by_asin(client: ScrapingBeeClient, asin: str) -> Optional[Pro
     }
     
     try:
-        response = client.get(url, params=ai_params)
+        response = await api_get(client, api_key, url, ai_params)
         
         if response.status_code != 200:
             error_msg = f"HTTP {response.status_code}"
@@ -97,50 +188,17 @@ def scrape_product_by_asin(client: ScrapingBeeClient, asin: str) -> Optional[Pro
             print(f"  ✗ Failed to scrape {asin}: {error_msg}")
             return None
         
-        results = response.json()
-        
-        # Extract price and convert to float
-        price = None
-        price_str = results.get("price", "")
-        if price_str:
-            # Remove currency symbols and extract number
-            price_clean = re.sub(r'[^\d.]', '', str(price_str))
-            try:
-                price = float(price_clean)
-            except (ValueError, TypeError):
-                pass
-        
-        # Extract title
-        title = results.get("title", "").strip()
-        if not title or len(title) < 5:
-            print(f"  ⚠ No title found for {asin}")
-            return None
-        
-        # Extract other fields
-        brand = results.get("brand", "").strip() or None
-        category = results.get("category", "").strip() or None
-        availability = results.get("availability", "Check availability").strip() or "Check availability"
-        seller = results.get("seller", "Amazon.com").strip() or "Amazon.com"
-        image_url = results.get("image_url", "").strip() or None
-        
-        return ProductIngest(
-            asin=asin,
-            title=title,
-            brand=brand,
-            category=category,
-            image_url=image_url,
-            price=price,
-            currency="USD",
-            availability=availability,
-            seller=seller
-        )
+        if page_cache.is_enabled():
+            await asyncio.to_thread(page_cache.store_page, asin, "scrapingbee", response.content)
+
+        return product_from_results(asin, response.json())
     
     except Exception as e:
         print(f"  ✗ Error scraping {asin}: {str(e)}")
         return None
 
 
-def scrape_search_results(client: ScrapingBeeClient, search_query: str, max_results: int = 15) -> List[ProductIngest]:
+async def scrape_search_results(client: httpx.AsyncClient, api_key: str, search_query: str, max_results: int = 15) -> List[ProductIngest]:
     """Scrape Amazon search results using ScrapingBee."""
     url = f"https://www.amazon.com/s?k={search_query.replace(' ', '+')}"
     
@@ -175,10 +233,9 @@ def scrape_search_results(client: ScrapingBeeClient, search_query: str, max_resu
         },
     }
     
-    # ScrapingBee Python client: pass dict for ai_extract_rules (client handles stringification)
     ai_params = {
         "ai_query": f"Extract the first {max_results} products with their names, prices, ASINs, brands, categories, availability, sellers, and product image URLs",
-        "ai_extract_rules": ai_extract_rules,  # Pass as dict - client will stringify
+        "ai_extract_rules": ai_extract_rules,
         "render_js": True,  # Required for Amazon's dynamic content
         "premium_proxy": True,  # Helpful for Amazon (may require premium plan)
         "wait": 2000,  # Wait 2 seconds for JS to render
@@ -186,7 +243,7 @@ def scrape_search_results(client: ScrapingBeeClient, search_query: str, max_resu
     }
     
     try:
-        response = client.get(url, params=ai_params)
+        response = await api_get(client, api_key, url, ai_params)
         
         if response.status_code != 200:
             print(f"✗ Failed to scrape search results: HTTP {response.status_code}")
@@ -244,7 +301,63 @@ def scrape_search_results(client: ScrapingBeeClient, search_query: str, max_resu
         return []
 
 
-def fetch_products(asins: Optional[List[str]] = None, search_query: Optional[str] = None) -> List[ProductIngest]:
+async def iter_products(
+    asins: Optional[List[str]] = None,
+    search_query: Optional[str] = None,
+) -> AsyncIterator[ProductIngest]:
+    """
+    Fetch products using the ScrapingBee API, yielding each as soon as it arrives.
+
+    At most SCRAPINGBEE_CONCURRENCY requests are in flight at a time over a
+    pooled keep-alive client.
+    """
+    api_key = os.getenv("SCRAPINGBEE_API_KEY")
+    if not api_key:
+        print("⚠ SCRAPINGBEE_API_KEY not found in environment variables")
+        return
+
+    owns_client = _client is None or _client.is_closed
+    client = new_client() if owns_client else _client
+    semaphore = asyncio.Semaphore(SCRAPINGBEE_CONCURRENCY)
+
+    async def scrape_one(i: int, asin: str) -> Optional[ProductIngest]:
+        async with semaphore:
+            started = time.perf_counter()
+            product = await scrape_product_by_asin(client, api_key, asin)
+            latency = time.perf_counter() - started
+        if product:
+            print(f"  [{i}/{len(asins)}] ✓ {asin} in {latency:.1f}s: {product.title[:60]}...")
+        else:
+            print(f"  [{i}/{len(asins)}] ✗ Failed to scrape {asin}")
+        return product
+
+    tasks = []
+    try:
+        # If search query is provided, scrape search results
+        if search_query:
+            print(f"🔍 Scraping Amazon search: '{search_query}'")
+            async with semaphore:
+                search_products = await scrape_search_results(client, api_key, search_query, max_results=15)
+            print(f"  ✓ Found {len(search_products)} products from search")
+            for product in search_products:
+                yield product
+
+        # Scrape individual products by ASIN
+        if asins:
+            print(f"📦 Scraping {len(asins)} products by ASIN ({SCRAPINGBEE_CONCURRENCY} at a time)...")
+            tasks = [asyncio.create_task(scrape_one(i, asin)) for i, asin in enumerate(asins, 1)]
+            for next_done in asyncio.as_completed(tasks):
+                product = await next_done
+                if product:
+                    yield product
+    finally:
+        for task in tasks:
+            task.cancel()
+        if owns_client:
+            await client.aclose()
+
+
+async def fetch_products(asins: Optional[List[str]] = None, search_query: Optional[str] = None) -> List[ProductIngest]:
     """
     Fetch products using ScrapingBee API.
     
@@ -255,33 +368,4 @@ def fetch_products(asins: Optional[List[str]] = None, search_query: Optional[str
     Returns:
         List of ProductIngest objects
     """
-    api_key = os.getenv("SCRAPINGBEE_API_KEY")
-    if not api_key:
-        print("⚠ SCRAPINGBEE_API_KEY not found in environment variables")
-        return []
-    
-    client = ScrapingBeeClient(api_key=api_key)
-    
-    products = []
-    
-    # If search query is provided, scrape search results
-    if search_query:
-        print(f"🔍 Scraping Amazon search: '{search_query}'")
-        search_products = scrape_search_results(client, search_query, max_results=15)
-        products.extend(search_products)
-        print(f"  ✓ Found {len(search_products)} products from search")
-    
-    # Scrape individual products by ASIN
-    if asins:
-        print(f"📦 Scraping {len(asins)} products by ASIN...")
-        for i, asin in enumerate(asins, 1):
-            print(f"  [{i}/{len(asins)}] Scraping {asin}...")
-            product = scrape_product_by_asin(client, asin)
-            if product:
-                products.append(product)
-                print(f"    ✓ Found: {product.title[:60]}...")
-            else:
-                print(f"    ✗ Failed to scrape {asin}")
-    
-    return products
-
+    return [product async for product in iter_products(asins, search_query)]
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import AsyncIterator, Optional
+import page_cache
+from page_cache import CacheEntry
+from provider_mock import ProductIngest
+
+# Cached pages handed to the process pool at a time
+REPARSE_CHUNK_SIZE = int(os.getenv("REPARSE_CHUNK_SIZE") or "1000")
+
+
+def parse_entry(entry: CacheEntry) -> Optional[dict]:
+    """Parse one cached page into ProductIngest fields. Runs in a worker process."""
+    try:
+        raw = page_cache.load_page(entry)
+    except (OSError, EOFError, zlib.error):
+        # Evicted by a concurrent ingest since it was listed, or truncated
+        return None
+
+    if entry.kind == "html":
+        from html_parser import parse_product_html
+        fields = parse_product_html(raw.decode("utf-8", errors="replace"))
+    elif entry.kind == "scrapingbee":
+        from provider_scrapingbee import product_from_results
+        product = product_from_results(entry.asin, json.loads(raw))
+        fields = product.model_dump(exclude={"asin"}) if product else None
+    else:
+        return None
+
+    if not fields:
+        return None
+    return {"asin": entry.asin, **fields}
+
+
+async def iter_reparsed_products(workers: Optional[int] = None) -> AsyncIterator[ProductIngest]:
+    """
+    Re-parse the latest cached page of every ASIN on all cores.
+
+    Never touches the network; pages whose blob was evicted are skipped.
+    """
+    loop = asyncio.get_running_loop()
+    entries = page_cache.iter_entries(latest_only=True)
+    parsed = failed = 0
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        while chunk := list(islice(entries, REPARSE_CHUNK_SIZE)):
+            results = await asyncio.gather(*[
+                loop.run_in_executor(pool, parse_entry, entry) for entry in chunk
+            ])
+            for fields in results:
+                if fields:
+                    parsed += 1
+                    yield ProductIngest(**fields)
+                else:
+                    failed += 1
+
+    print(f"🔁 Re-parsed {parsed} cached pages ({failed} could not be parsed)")
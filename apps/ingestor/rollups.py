@@ -0,0 +1,387 @@
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from writer import BUMP_GENERATION_QUERY
+
+# Days of price_daily built on the first refresh; older days need backfill-prices
+PRICE_DAILY_INITIAL_DAYS = int(os.getenv("PRICE_DAILY_INITIAL_DAYS") or "30")
+
+# Lower edges of the price facet buckets; keep in step with the API's /products/facets
+PRICE_BUCKET_EDGES = (0, 25, 50, 100, 250, 500, 1000)
+
+# Catalog-wide KPIs from current_offers, which holds one row per product.
+# Like the other rollup upserts, rows are only rewritten when a value changed,
+# so the row count tells refresh_rollups whether the API's view changed.
+REFRESH_CATALOG_STATS_QUERY = text("""
+    INSERT INTO catalog_stats (
+        id, product_count, priced_count, in_stock_count, avg_price, median_price, refreshed_at
+    )
+    SELECT
+        1,
+        COUNT(*),
+        COUNT(co.price),
+        COUNT(*) FILTER (WHERE co.availability ILIKE '%in stock%'),
+        ROUND(AVG(co.price), 2),
+        PERCENTILE_DISC(0.5) WITHIN GROUP (ORDER BY co.price),
+        NOW()
+    FROM products p
+    LEFT JOIN current_offers co ON co.product_id = p.asin
+    ON CONFLICT (id) DO UPDATE SET
+        product_count = EXCLUDED.product_count,
+        priced_count = EXCLUDED.priced_count,
+        in_stock_count = EXCLUDED.in_stock_count,
+        avg_price = EXCLUDED.avg_price,
+        median_price = EXCLUDED.median_price,
+        refreshed_at = EXCLUDED.refreshed_at
+    WHERE (
+        catalog_stats.product_count, catalog_stats.priced_count, catalog_stats.in_stock_count,
+        catalog_stats.avg_price, catalog_stats.median_price
+    ) IS DISTINCT FROM (
+        EXCLUDED.product_count, EXCLUDED.priced_count, EXCLUDED.in_stock_count,
+        EXCLUDED.avg_price, EXCLUDED.median_price
+    )
+""")
+
+# Recompute the latest stored UTC day and everything after it; on the first
+# run this backfills the last 30 days. An offers run is seen on every day from
+# fetched_at to last_seen_at, so runs that started before the window come from
+# current_offers and the run each changed product replaced, keeping the scan
+# of offers itself to the window's partitions.
+REFRESH_DAILY_STATS_QUERY = text("""
+    WITH since AS (
+        SELECT COALESCE(MAX(day), CAST(NOW() AT TIME ZONE 'UTC' AS date) - 29) AS day
+        FROM daily_stats
+    ),
+    window_start AS (
+        SELECT CAST(day AS timestamp) AT TIME ZONE 'UTC' AS ts FROM since
+    ),
+    days AS (
+        SELECT CAST(d AS date) AS day
+        FROM since, generate_series(since.day, CAST(NOW() AT TIME ZONE 'UTC' AS date), INTERVAL '1 day') AS d
+    ),
+    offer_runs AS (
+        -- Runs started in the window, read from its partitions only
+        SELECT product_id, price, fetched_at, last_seen_at
+        FROM offers
+        WHERE fetched_at >= (SELECT ts FROM window_start)
+        UNION ALL
+        -- Current runs started before the window
+        SELECT product_id, price, first_seen_at, fetched_at
+        FROM current_offers
+        WHERE first_seen_at < (SELECT ts FROM window_start)
+          AND fetched_at >= (SELECT ts FROM window_start)
+        UNION ALL
+        -- Runs started before the window and replaced during it: at most
+        -- one per product that changed, found through idx_offers_latest
+        SELECT earlier.*
+        FROM (
+            SELECT DISTINCT product_id FROM offers WHERE fetched_at >= (SELECT ts FROM window_start)
+        ) changed
+        CROSS JOIN LATERAL (
+            SELECT o.product_id, o.price, o.fetched_at, o.last_seen_at
+            FROM offers o
+            WHERE o.product_id = changed.product_id
+              AND o.fetched_at < (SELECT ts FROM window_start)
+            ORDER BY o.fetched_at DESC
+            LIMIT 1
+        ) earlier
+        WHERE earlier.last_seen_at >= (SELECT ts FROM window_start)
+    ),
+    offer_days AS (
+        -- offers rows are runs, so a day counts every offer seen during it
+        SELECT
+            days.day,
+            COUNT(*) AS offers_count,
+            ROUND(AVG(r.price), 2) AS avg_price
+        FROM days
+        JOIN offer_runs r
+            ON r.fetched_at < CAST(days.day + 1 AS timestamp) AT TIME ZONE 'UTC'
+            AND r.last_seen_at >= CAST(days.day AS timestamp) AT TIME ZONE 'UTC'
+        GROUP BY days.day
+    ),
+    change_days AS (
+        SELECT
+            CAST(fetched_at AT TIME ZONE 'UTC' AS date) AS day,
+            COUNT(*) FILTER (WHERE change_type = 'price_change') AS price_changes,
+            COUNT(*) FILTER (WHERE change_type = 'availability_change') AS availability_changes
+        FROM offer_history
+        WHERE fetched_at >= (SELECT ts FROM window_start)
+        GROUP BY 1
+    )
+    INSERT INTO daily_stats (
+        day, offers_count, avg_price, price_changes, availability_changes, refreshed_at
+    )
+    SELECT
+        days.day,
+        COALESCE(o.offers_count, 0),
+        o.avg_price,
+        COALESCE(c.price_changes, 0),
+        COALESCE(c.availability_changes, 0),
+        NOW()
+    FROM days
+    LEFT JOIN offer_days o ON o.day = days.day
+    LEFT JOIN change_days c ON c.day = days.day
+    ON CONFLICT (day) DO UPDATE SET
+        offers_count = EXCLUDED.offers_count,
+        avg_price = EXCLUDED.avg_price,
+        price_changes = EXCLUDED.price_changes,
+        availability_changes = EXCLUDED.availability_changes,
+        refreshed_at = EXCLUDED.refreshed_at
+    WHERE (
+        daily_stats.offers_count, daily_stats.avg_price,
+        daily_stats.price_changes, daily_stats.availability_changes
+    ) IS DISTINCT FROM (
+        EXCLUDED.offers_count, EXCLUDED.avg_price,
+        EXCLUDED.price_changes, EXCLUDED.availability_changes
+    )
+""")
+
+
+# Unfiltered brand, category, stock and price-bucket counts for /products/facets.
+# Returns the number of facet_counts rows added, changed or removed.
+REFRESH_FACET_COUNTS_QUERY = text(f"""
+    WITH counts AS (
+        SELECT facet, value, count
+        FROM (
+            SELECT
+                CASE
+                    WHEN GROUPING(brand) = 0 THEN 'brand'
+                    WHEN GROUPING(category) = 0 THEN 'category'
+                    WHEN GROUPING(stock) = 0 THEN 'stock'
+                    ELSE 'price'
+                END AS facet,
+                COALESCE(brand, category, stock, CAST(price_bucket AS text)) AS value,
+                COUNT(*) AS count
+            FROM (
+                SELECT
+                    p.brand,
+                    p.category,
+                    CASE WHEN co.availability ILIKE '%in stock%' THEN 'in_stock' ELSE 'out_of_stock' END AS stock,
+                    width_bucket(co.price, CAST(ARRAY{list(PRICE_BUCKET_EDGES)} AS numeric[])) AS price_bucket
+                FROM products p
+                LEFT JOIN current_offers co ON co.product_id = p.asin
+            ) f
+            GROUP BY GROUPING SETS ((brand), (category), (stock), (price_bucket))
+        ) grouped
+        WHERE value IS NOT NULL
+    ),
+    removed AS (
+        DELETE FROM facet_counts fc
+        WHERE NOT EXISTS (SELECT 1 FROM counts c WHERE c.facet = fc.facet AND c.value = fc.value)
+        RETURNING 1
+    ),
+    upserted AS (
+        INSERT INTO facet_counts (facet, value, count)
+        SELECT facet, value, count FROM counts
+        ON CONFLICT (facet, value) DO UPDATE SET count = EXCLUDED.count
+        WHERE facet_counts.count <> EXCLUDED.count
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM removed) + (SELECT COUNT(*) FROM upserted)
+""")
+
+PRICE_DAILY_LAST_DAY_QUERY = text("SELECT MAX(day) FROM price_daily")
+
+# Every product write bumps products.updated_at, so this moves whenever
+# catalog_stats or facet_counts could have changed (idx_products_updated_asin)
+PRODUCTS_LAST_UPDATED_QUERY = text("SELECT MAX(updated_at) FROM products")
+
+# products.updated_at as of the last catalog_stats/facet_counts rebuild in this process
+_catalog_built_for: Optional[datetime] = None
+
+# Daily OHLC per product for UTC days :since..:until, only for the products
+# and days with offer_history rows: a day without changes has no row, and
+# readers carry the previous row's close forward. Each offer_history row holds
+# until the next one (or now), so a day also covers the state carried in from
+# before it, taken from the product's previous price_daily row (or, for a
+# product the rollup has not seen yet, its last history row before the
+# window). change_count counts the changes made during the day.
+REFRESH_PRICE_DAILY_QUERY = text("""
+    WITH bounds AS (
+        SELECT
+            CAST(CAST(:since AS date) AS timestamp) AT TIME ZONE 'UTC' AS window_start,
+            CAST(CAST(:until AS date) + 1 AS timestamp) AT TIME ZONE 'UTC' AS window_end
+    ),
+    window_events AS (
+        SELECT product_id, price, currency, availability, change_type, fetched_at
+        FROM offer_history
+        WHERE fetched_at >= (SELECT window_start FROM bounds)
+          AND fetched_at < (SELECT window_end FROM bounds)
+    ),
+    changed AS (
+        SELECT DISTINCT product_id FROM window_events
+    ),
+    previous_days AS (
+        SELECT ch.product_id, prev.close, prev.currency, prev.availability
+        FROM changed ch
+        CROSS JOIN LATERAL (
+            SELECT pd.close, pd.currency, pd.availability
+            FROM price_daily pd
+            WHERE pd.product_id = ch.product_id
+              AND pd.day < CAST(:since AS date)
+            ORDER BY pd.day DESC
+            LIMIT 1
+        ) prev
+    ),
+    carried AS (
+        SELECT product_id, close AS price, currency, availability
+        FROM previous_days
+        UNION ALL
+        SELECT ch.product_id, h.price, h.currency, h.availability
+        FROM changed ch
+        CROSS JOIN LATERAL (
+            SELECT h.price, h.currency, h.availability
+            FROM offer_history h
+            WHERE h.product_id = ch.product_id
+              AND h.fetched_at < (SELECT window_start FROM bounds)
+            ORDER BY h.fetched_at DESC
+            LIMIT 1
+        ) h
+        WHERE ch.product_id NOT IN (SELECT product_id FROM previous_days)
+    ),
+    events AS (
+        SELECT product_id, price, currency, availability, change_type, fetched_at, TRUE AS is_event
+        FROM window_events
+        UNION ALL
+        SELECT product_id, price, currency, availability, NULL, (SELECT window_start FROM bounds), FALSE
+        FROM carried
+    ),
+    segments AS (
+        SELECT
+            *,
+            COALESCE(LEAD(fetched_at) OVER (PARTITION BY product_id ORDER BY fetched_at), NOW()) AS ends_at
+        FROM events
+    ),
+    days AS (
+        SELECT
+            CAST(d AS date) AS day,
+            CAST(d AS timestamp) AT TIME ZONE 'UTC' AS day_start,
+            CAST(d + INTERVAL '1 day' AS timestamp) AT TIME ZONE 'UTC' AS day_end
+        FROM generate_series(CAST(:since AS date), CAST(:until AS date), INTERVAL '1 day') AS d
+    ),
+    day_segments AS (
+        SELECT
+            s.*,
+            days.day,
+            days.day_start,
+            LEAST(s.ends_at, days.day_end) - GREATEST(s.fetched_at, days.day_start) AS held
+        FROM segments s
+        JOIN days ON s.fetched_at < days.day_end AND s.ends_at > days.day_start
+    )
+    INSERT INTO price_daily (
+        product_id, day, open, high, low, close, currency, availability,
+        in_stock_minutes, change_count, refreshed_at
+    )
+    SELECT
+        product_id,
+        day,
+        (array_agg(price ORDER BY fetched_at) FILTER (WHERE price IS NOT NULL))[1],
+        MAX(price),
+        MIN(price),
+        (array_agg(price ORDER BY fetched_at DESC) FILTER (WHERE price IS NOT NULL))[1],
+        (array_agg(currency ORDER BY fetched_at DESC))[1],
+        (array_agg(availability ORDER BY fetched_at DESC))[1],
+        COALESCE(CAST(EXTRACT(EPOCH FROM SUM(held) FILTER (WHERE availability ILIKE '%in stock%')) / 60 AS integer), 0),
+        COUNT(*) FILTER (WHERE change_type <> 'initial' AND fetched_at >= day_start),
+        NOW()
+    FROM day_segments
+    GROUP BY product_id, day
+    HAVING bool_or(is_event AND fetched_at >= day_start)
+    ON CONFLICT (product_id, day) DO UPDATE SET
+        open = EXCLUDED.open,
+        high = EXCLUDED.high,
+        low = EXCLUDED.low,
+        close = EXCLUDED.close,
+        currency = EXCLUDED.currency,
+        availability = EXCLUDED.availability,
+        in_stock_minutes = EXCLUDED.in_stock_minutes,
+        change_count = EXCLUDED.change_count,
+        refreshed_at = EXCLUDED.refreshed_at
+""")
+
+CLEAR_PRICE_DAILY_QUERY = text("""
+    DELETE FROM price_daily WHERE day >= CAST(:since AS date) AND day <= CAST(:until AS date)
+""")
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+async def refresh_price_daily(session: AsyncSession, since: Optional[date] = None, until: Optional[date] = None):
+    """
+    Rebuild price_daily for the UTC days since..until (default: today). Does not commit.
+
+    Only products with offer_history rows in the range are touched. Without
+    `since`, recomputes the latest stored day onwards, or the last
+    PRICE_DAILY_INITIAL_DAYS days when the table is empty.
+    """
+    until = until or utc_today()
+    if since is None:
+        last_day = await session.scalar(PRICE_DAILY_LAST_DAY_QUERY)
+        since = last_day or until - timedelta(days=PRICE_DAILY_INITIAL_DAYS - 1)
+    await session.execute(REFRESH_PRICE_DAILY_QUERY, {"since": since, "until": until})
+
+
+FIRST_HISTORY_DAY_QUERY = text("""
+    SELECT CAST(MIN(fetched_at) AT TIME ZONE 'UTC' AS date) FROM offer_history
+""")
+
+
+async def backfill_price_daily(session: AsyncSession, since: Optional[date] = None, chunk_days: int = 31):
+    """
+    Rebuild price_daily from `since` (default: the first offer_history day)
+    through today, clearing and rebuilding `chunk_days` days per commit.
+    Returns the days rebuilt.
+    """
+    until = utc_today()
+    since = since or await session.scalar(FIRST_HISTORY_DAY_QUERY)
+    if since is None:
+        return 0
+
+    day = since
+    while day <= until:
+        chunk_until = min(day + timedelta(days=chunk_days - 1), until)
+        await session.execute(CLEAR_PRICE_DAILY_QUERY, {"since": day, "until": chunk_until})
+        await refresh_price_daily(session, day, chunk_until)
+        await session.commit()
+        print(f"  📈 price_daily {day} .. {chunk_until}")
+        day = chunk_until + timedelta(days=1)
+
+    await session.execute(BUMP_GENERATION_QUERY)
+    await session.commit()
+    return (until - since).days + 1
+
+
+async def refresh_rollups(session: AsyncSession, written: bool = True):
+    """
+    Refresh the rollups read by the API's /stats, /products/facets and
+    long-range sparklines, and commit.
+
+    catalog_stats and facet_counts are rebuilt from current_offers (one row
+    per product), but only when products were `written` or updated since the
+    last rebuild, so idle cycles skip the full scan. daily_stats and
+    price_daily only rescan offers and history since their latest stored
+    day. The ingest generation is bumped, invalidating the API's cached
+    responses, only when products were written or the served rollups changed,
+    so idle cycles keep ETags valid.
+    """
+    global _catalog_built_for
+    last_updated = await session.scalar(PRODUCTS_LAST_UPDATED_QUERY)
+    rebuild_catalog = written or _catalog_built_for is None or last_updated != _catalog_built_for
+
+    changed = 0
+    if rebuild_catalog:
+        changed += (await session.execute(REFRESH_CATALOG_STATS_QUERY)).rowcount
+    changed += (await session.execute(REFRESH_DAILY_STATS_QUERY)).rowcount
+    await refresh_price_daily(session)
+    if rebuild_catalog:
+        changed += await session.scalar(REFRESH_FACET_COUNTS_QUERY)
+    if written or changed:
+        await session.execute(BUMP_GENERATION_QUERY)
+    await session.commit()
+    if rebuild_catalog:
+        _catalog_built_for = last_updated
+    print("📈 Refreshed dashboard rollups")
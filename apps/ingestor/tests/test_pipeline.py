@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+import pipeline
+from pipeline import ProviderFailed, write_stream
+from provider_mock import ProductIngest
+
+
+class FakeSession:
+    """Collects the products written by each commit."""
+
+    def __init__(self):
+        self.pending = []
+        self.commits = []
+
+    async def commit(self):
+        self.commits.append([p.asin for p in self.pending])
+        self.pending = []
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession()
+
+    async def write_products(session, products):
+        session.pending.extend(products)
+        return len(products)
+
+    monkeypatch.setattr(pipeline, "write_products", write_products)
+    return session
+
+
+async def provider(asins, pause_after=None, pause=0.0, error=None):
+    for i, asin in enumerate(asins):
+        if i == pause_after:
+            await asyncio.sleep(pause)
+        yield ProductIngest(asin=asin, title=f"Product {asin}")
+    if error:
+        raise error
+
+
+def stream(session, products, **kwargs):
+    kwargs.setdefault("only_new", False)
+    return asyncio.run(write_stream(products, session, **kwargs))
+
+
+def test_commits_every_batch_size_products(session):
+    written = stream(session, provider(["A", "B", "C", "D", "E"]), batch_size=2, interval=60)
+
+    assert written == 5
+    assert session.commits == [["A", "B"], ["C", "D"], ["E"]]
+
+
+def test_commits_buffered_products_when_interval_elapses(session):
+    products = provider(["A", "B", "C"], pause_after=2, pause=0.5)
+
+    written = stream(session, products, batch_size=100, interval=0.1)
+
+    # A and B were committed while the provider was still working on C
+    assert written == 3
+    assert session.commits == [["A", "B"], ["C"]]
+
+
+def test_commits_buffer_before_raising_provider_failure(session):
+    error = RuntimeError("browser crashed")
+
+    with pytest.raises(ProviderFailed) as failure:
+        stream(session, provider(["A", "B", "C"], error=error), batch_size=100, interval=60)
+
+    assert failure.value.__cause__ is error
+    assert session.commits == [["A", "B", "C"]]
+
+
+def test_only_new_drops_products_stored_meanwhile(session, monkeypatch):
+    async def filter_new_asins(session, asins):
+        return [asin for asin in asins if asin != "B"]
+
+    monkeypatch.setattr(pipeline, "filter_new_asins", filter_new_asins)
+
+    written = stream(session, provider(["A", "B", "C"]), batch_size=100, interval=60, only_new=True)
+
+    assert written == 2
+    assert session.commits == [["A", "C"]]
@@ -0,0 +1,127 @@
+import asyncio
+import sys
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+import provider_http
+from html_parser import parse_product_html
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def load_fixture(name: str) -> str:
+    return (FIXTURES / f"{name}.html").read_text()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves /dp/<ASIN> from fixtures/<ASIN>.html, and the captcha page for unknown ASINs."""
+
+    def do_GET(self):
+        asin = self.path.rstrip("/").rsplit("/", 1)[-1]
+        page = FIXTURES / f"{asin}.html"
+        body = (page if page.exists() else FIXTURES / "captcha.html").read_bytes()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in_server(monkeypatch):
+    """A local stand-in for the product site, with HTTP_BASE_URL pointed at it."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(provider_http, "HTTP_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(provider_http, "HTTP_HOST_DELAY_SECONDS", 0.0)
+    monkeypatch.setattr(provider_http, "HTTP_HOST_JITTER_SECONDS", 0.0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def browser_fallback(monkeypatch):
+    """Replace the Playwright provider with one that records the ASINs it is asked for."""
+    requested = []
+
+    async def iter_products(asins):
+        requested.extend(asins)
+        for asin in asins:
+            yield provider_http.ProductIngest(asin=asin, title=f"Browser-rendered {asin}")
+
+    module = types.ModuleType("provider_scraper")
+    module.iter_products = iter_products
+    monkeypatch.setitem(sys.modules, "provider_scraper", module)
+    monkeypatch.setattr(provider_http, "HTTP_FALLBACK_TO_BROWSER", True)
+    return requested
+
+
+def collect(asins):
+    async def run():
+        return [product async for product in provider_http.iter_products(asins)]
+    return asyncio.run(run())
+
+
+def test_parse_product_page():
+    fields = parse_product_html(load_fixture("B07XJ8C8F5"))
+
+    assert fields == {
+        "title": "Echo Dot (4th Gen, 2020 release) | Smart speaker with Alexa | Charcoal",
+        "brand": "Amazon Store",
+        "category": "Smart Speakers",
+        "image_url": "https://m.media-amazon.com/images/I/21Q1l9xX--L._AC_SX450_.jpg",
+        "price": 29.99,
+        "currency": "USD",
+        "availability": "In Stock",
+        "seller": "Amazon.com",
+    }
+
+
+def test_parse_skips_non_numeric_price_selector():
+    fields = parse_product_html(load_fixture("B09JQMJSXY"))
+
+    assert fields["price"] == 499.99
+    assert fields["brand"] == "Sony"
+    assert fields["category"] == "PlayStation 5"
+    assert fields["availability"] == "Only 3 left in stock - order soon."
+    assert fields["image_url"] == "https://m.media-amazon.com/images/I/01f+GVvouTS._AC_SL1500_.jpg"
+    # No seller on the page
+    assert fields["seller"] == "Amazon.com"
+
+
+def test_parse_captcha_page_returns_none():
+    assert parse_product_html(load_fixture("captcha")) is None
+
+
+def test_iter_products_over_http(stand_in_server, browser_fallback):
+    products = collect(["B07XJ8C8F5", "B09JQMJSXY"])
+
+    assert sorted((p.asin, p.price) for p in products) == [("B07XJ8C8F5", 29.99), ("B09JQMJSXY", 499.99)]
+    assert browser_fallback == []
+
+
+def test_unparsed_pages_fall_back_to_browser(stand_in_server, browser_fallback):
+    products = collect(["B07XJ8C8F5", "B000CAPTCH"])
+
+    assert browser_fallback == ["B000CAPTCH"]
+    by_asin = {p.asin: p for p in products}
+    assert by_asin["B07XJ8C8F5"].price == 29.99
+    assert by_asin["B000CAPTCH"].title == "Browser-rendered B000CAPTCH"
+
+
+def test_no_fallback_when_disabled(stand_in_server, browser_fallback, monkeypatch):
+    monkeypatch.setattr(provider_http, "HTTP_FALLBACK_TO_BROWSER", False)
+
+    products = collect(["B000CAPTCH"])
+
+    assert products == []
+    assert browser_fallback == []
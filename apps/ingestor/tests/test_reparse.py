@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import pytest
+
+import page_cache
+from reparse import parse_entry
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_cache, "PAGE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(page_cache, "_total_bytes", None)
+    return tmp_path
+
+
+def store_fixture(asin: str) -> page_cache.CacheEntry:
+    page_cache.store_page(asin, "html", (FIXTURES / f"{asin}.html").read_text())
+    return next(page_cache.iter_entries())
+
+
+def test_parse_cached_page(cache_dir):
+    fields = parse_entry(store_fixture("B07XJ8C8F5"))
+
+    assert fields["asin"] == "B07XJ8C8F5"
+    assert fields["price"] == 29.99
+
+
+def test_blob_evicted_after_listing_is_skipped(cache_dir):
+    entry = store_fixture("B07XJ8C8F5")
+    page_cache._blob_path(entry.digest).unlink()
+
+    assert parse_entry(entry) is None
+
+
+def test_truncated_blob_is_skipped(cache_dir):
+    entry = store_fixture("B07XJ8C8F5")
+    blob = page_cache._blob_path(entry.digest)
+    blob.write_bytes(blob.read_bytes()[:40])
+
+    assert parse_entry(entry) is None
+
+
+def test_corrupt_blob_is_skipped(cache_dir):
+    entry = store_fixture("B07XJ8C8F5")
+    page_cache._blob_path(entry.digest).write_bytes(b"not gzip at all")
+
+    assert parse_entry(entry) is None
@@ -0,0 +1,191 @@
+import asyncio
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import writer
+from provider_mock import ProductIngest
+from writer import dedupe_products, detect_change, normalize_price, write_products
+
+FIRST_SEEN = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def offer(asin, offer_id, price=Decimal("19.99"), availability="In Stock", seller="Amazon.com", currency="USD"):
+    """A current_offers row as returned by LATEST_OFFERS_QUERY."""
+    return SimpleNamespace(
+        product_id=asin, offer_id=offer_id, first_seen_at=FIRST_SEEN,
+        price=price, currency=currency, availability=availability, seller=seller,
+    )
+
+
+def product(asin, price=19.99, availability="In Stock", seller="Amazon.com", **fields):
+    return ProductIngest(asin=asin, title=f"Product {asin}", price=price, availability=availability, seller=seller, **fields)
+
+
+class FakeSession:
+    """Records the statements write_products sends and answers its two queries."""
+
+    def __init__(self, offers=(), missing_runs=()):
+        self.offers = {row.product_id: row for row in offers}
+        # Products whose offers run the extend UPDATE no longer finds
+        self.missing_runs = set(missing_runs)
+        self.calls = []
+
+    async def execute(self, statement, params=None):
+        self.calls.append((statement, params))
+        if statement is writer.LATEST_OFFERS_QUERY:
+            rows = [self.offers[asin] for asin in params["asins"] if asin in self.offers]
+            return SimpleNamespace(fetchall=lambda: rows)
+        if statement is writer.EXTEND_OFFERS_QUERY:
+            found = [
+                row.product_id for row in self.offers.values()
+                if row.offer_id in params["offer_ids"] and row.product_id not in self.missing_runs
+            ]
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: found))
+        return SimpleNamespace()
+
+    def statements(self):
+        return [statement for statement, _ in self.calls]
+
+    def params(self, statement):
+        matches = [params for sent, params in self.calls if sent is statement]
+        assert len(matches) == 1
+        return matches[0]
+
+
+def write(session, products):
+    return asyncio.run(write_products(session, products))
+
+
+def test_dedupe_products_keeps_last_record_in_first_seen_order():
+    products = [product("A", price=1), product("B"), product("A", price=2)]
+
+    deduped = dedupe_products(products)
+
+    assert [p.asin for p in deduped] == ["A", "B"]
+    assert deduped[0].price == 2
+
+
+def test_normalize_price_rounds_to_cents():
+    assert normalize_price(None) is None
+    assert normalize_price(19.999) == Decimal("20.00")
+    assert normalize_price(0.125) == Decimal("0.13")
+    assert normalize_price(Decimal("5")) == Decimal("5.00")
+
+
+def test_detect_change():
+    previous = offer("A", 1)
+
+    assert detect_change(None, product("A")) == "initial"
+    assert detect_change(previous, product("A")) is None
+    assert detect_change(previous, product("A", price=18.49)) == "price_change"
+    assert detect_change(previous, product("A", availability="Out of Stock")) == "availability_change"
+    assert detect_change(previous, product("A", seller="Other Seller")) == "other"
+    assert detect_change(previous, product("A", currency="EUR")) == "other"
+
+
+def test_float_price_matching_stored_decimal_is_not_a_change():
+    # The provider parses floats; the row comes back as DECIMAL(10, 2)
+    assert 19.99 != Decimal("19.99")
+    assert detect_change(offer("A", 1, price=Decimal("19.99")), product("A", price=19.99)) is None
+    assert detect_change(offer("A", 1, price=Decimal("0.10")), product("A", price=0.1)) is None
+    assert detect_change(offer("A", 1, price=None), product("A", price=None)) is None
+    assert detect_change(offer("A", 1, price=None), product("A", price=19.99)) == "price_change"
+
+
+def test_unrounded_float_price_rounds_to_stored_cents():
+    assert detect_change(offer("A", 1, price=Decimal("19.99")), product("A", price=19.9899999)) is None
+    assert detect_change(offer("A", 1, price=Decimal("19.99")), product("A", price=19.994)) is None
+    assert detect_change(offer("A", 1, price=Decimal("19.99")), product("A", price=19.995)) == "price_change"
+
+
+def test_write_products_float_price_equal_to_stored_decimal_extends_run():
+    session = FakeSession(offers=[offer("A", 1, price=Decimal("29.99"))])
+
+    write(session, [product("A", price=29.99)])
+
+    assert writer.INSERT_HISTORY_QUERY not in session.statements()
+    assert writer.INSERT_OFFERS_QUERY not in session.statements()
+
+
+def test_write_products_with_nothing_to_write():
+    session = FakeSession()
+
+    assert write(session, []) == 0
+    assert session.calls == []
+
+
+def test_write_products_new_changed_and_unchanged():
+    session = FakeSession(offers=[offer("CHANGED", 1), offer("SAME", 2)])
+    products = [product("NEW", price=5.5), product("CHANGED", price=17.0), product("SAME")]
+
+    assert write(session, products) == 3
+
+    assert session.statements() == [
+        writer.UPSERT_PRODUCTS_QUERY,
+        writer.LATEST_OFFERS_QUERY,
+        writer.EXTEND_OFFERS_QUERY,
+        writer.INSERT_OFFERS_QUERY,
+        writer.INSERT_HISTORY_QUERY,
+        writer.BUMP_GENERATION_QUERY,
+    ]
+    assert session.params(writer.UPSERT_PRODUCTS_QUERY)["asins"] == ["NEW", "CHANGED", "SAME"]
+    assert session.params(writer.LATEST_OFFERS_QUERY) == {"asins": ["NEW", "CHANGED", "SAME"]}
+    assert session.params(writer.EXTEND_OFFERS_QUERY) == {"offer_ids": [2], "first_seen_ats": [FIRST_SEEN]}
+
+    runs = session.params(writer.INSERT_OFFERS_QUERY)
+    assert runs["asins"] == ["NEW", "CHANGED"]
+    assert runs["prices"] == [Decimal("5.50"), Decimal("17.00")]
+
+    history = session.params(writer.INSERT_HISTORY_QUERY)
+    assert history["asins"] == ["NEW", "CHANGED"]
+    assert history["change_types"] == ["initial", "price_change"]
+
+
+def test_write_products_all_unchanged_only_extends_runs():
+    session = FakeSession(offers=[offer("A", 1), offer("B", 2)])
+
+    assert write(session, [product("A"), product("B")]) == 2
+
+    assert session.statements() == [
+        writer.UPSERT_PRODUCTS_QUERY,
+        writer.LATEST_OFFERS_QUERY,
+        writer.EXTEND_OFFERS_QUERY,
+        writer.BUMP_GENERATION_QUERY,
+    ]
+    assert session.params(writer.EXTEND_OFFERS_QUERY)["offer_ids"] == [1, 2]
+
+
+def test_unchanged_offer_extends_its_run_by_id_and_first_seen():
+    session = FakeSession(offers=[offer("A", 41), offer("B", 42)])
+
+    write(session, [product("A"), product("B", price=1.0)])
+
+    # Both keys, so the UPDATE is pruned to the run's partition
+    assert session.params(writer.EXTEND_OFFERS_QUERY) == {"offer_ids": [41], "first_seen_ats": [FIRST_SEEN]}
+    assert session.params(writer.INSERT_OFFERS_QUERY)["asins"] == ["B"]
+    assert session.params(writer.INSERT_HISTORY_QUERY)["asins"] == ["B"]
+
+
+def test_missing_run_starts_a_new_one_without_history():
+    # A's run was in a dropped partition, so the extend UPDATE doesn't find it
+    session = FakeSession(offers=[offer("A", 1), offer("B", 2)], missing_runs=["A"])
+
+    write(session, [product("A"), product("B")])
+
+    assert session.params(writer.EXTEND_OFFERS_QUERY)["offer_ids"] == [1, 2]
+    runs = session.params(writer.INSERT_OFFERS_QUERY)
+    assert runs["asins"] == ["A"]
+    assert runs["prices"] == [Decimal("19.99")]
+    # The offer itself didn't change
+    assert writer.INSERT_HISTORY_QUERY not in session.statements()
+
+
+def test_new_and_changed_products_skip_the_extend_query():
+    session = FakeSession(offers=[offer("A", 1)])
+
+    write(session, [product("A", availability="Out of Stock"), product("NEW")])
+
+    assert writer.EXTEND_OFFERS_QUERY not in session.statements()
+    assert session.params(writer.INSERT_OFFERS_QUERY)["asins"] == ["A", "NEW"]
+    assert session.params(writer.INSERT_HISTORY_QUERY)["change_types"] == ["availability_change", "initial"]
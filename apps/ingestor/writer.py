@@ -0,0 +1,207 @@
+import os
+from decimal import Decimal, ROUND_HALF_UP
+from typing import List, Optional, Sequence
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Number of products staged per set-based write
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE") or "500")
+
+
+UPSERT_PRODUCTS_QUERY = text("""
+    INSERT INTO products (asin, title, brand, category, image_url, updated_at)
+    SELECT b.asin, b.title, b.brand, b.category, b.image_url, NOW()
+    FROM unnest(
+        CAST(:asins AS varchar[]),
+        CAST(:titles AS text[]),
+        CAST(:brands AS varchar[]),
+        CAST(:categories AS varchar[]),
+        CAST(:image_urls AS text[])
+    ) AS b(asin, title, brand, category, image_url)
+    ON CONFLICT (asin) DO UPDATE SET
+        title = EXCLUDED.title,
+        brand = EXCLUDED.brand,
+        category = EXCLUDED.category,
+        image_url = EXCLUDED.image_url,
+        updated_at = NOW()
+""")
+
+LATEST_OFFERS_QUERY = text("""
+    SELECT product_id, offer_id, first_seen_at, price, currency, availability, seller
+    FROM current_offers
+    WHERE product_id = ANY(:asins)
+""")
+
+# Starts a new offers run and moves current_offers forward in a single statement
+INSERT_OFFERS_QUERY = text("""
+    WITH inserted AS (
+        INSERT INTO offers (product_id, price, currency, availability, seller, fetched_at, last_seen_at)
+        SELECT b.product_id, b.price, b.currency, b.availability, b.seller, NOW(), NOW()
+        FROM unnest(
+            CAST(:asins AS varchar[]),
+            CAST(:prices AS numeric(10, 2)[]),
+            CAST(:currencies AS varchar[]),
+            CAST(:availabilities AS text[]),
+            CAST(:sellers AS varchar[])
+        ) AS b(product_id, price, currency, availability, seller)
+        RETURNING id, product_id, price, currency, availability, seller, fetched_at
+    )
+    INSERT INTO current_offers (
+        product_id, offer_id, first_seen_at, price, currency, availability, seller, fetched_at
+    )
+    SELECT product_id, id, fetched_at, price, currency, availability, seller, fetched_at
+    FROM inserted
+    ON CONFLICT (product_id) DO UPDATE SET
+        offer_id = EXCLUDED.offer_id,
+        first_seen_at = EXCLUDED.first_seen_at,
+        price = EXCLUDED.price,
+        currency = EXCLUDED.currency,
+        availability = EXCLUDED.availability,
+        seller = EXCLUDED.seller,
+        fetched_at = EXCLUDED.fetched_at
+    WHERE current_offers.fetched_at <= EXCLUDED.fetched_at
+""")
+
+# Extends unchanged offers runs in place instead of inserting duplicate rows.
+# Neither last_seen_at nor current_offers.fetched_at is indexed, so these stay
+# HOT updates. Returns the products whose run was found; a run can be missing
+# if its partition was dropped, in which case a new one is started.
+EXTEND_OFFERS_QUERY = text("""
+    WITH extended AS (
+        UPDATE offers o SET last_seen_at = NOW()
+        FROM unnest(
+            CAST(:offer_ids AS integer[]),
+            CAST(:first_seen_ats AS timestamptz[])
+        ) AS b(id, fetched_at)
+        WHERE o.id = b.id AND o.fetched_at = b.fetched_at
+        RETURNING o.product_id
+    )
+    UPDATE current_offers co SET fetched_at = NOW()
+    FROM extended
+    WHERE co.product_id = extended.product_id
+    RETURNING co.product_id
+""")
+
+INSERT_HISTORY_QUERY = text("""
+    INSERT INTO offer_history (
+        product_id, price, currency, availability, seller, change_type, fetched_at
+    )
+    SELECT b.product_id, b.price, b.currency, b.availability, b.seller, b.change_type, NOW()
+    FROM unnest(
+        CAST(:asins AS varchar[]),
+        CAST(:prices AS numeric(10, 2)[]),
+        CAST(:currencies AS varchar[]),
+        CAST(:availabilities AS text[]),
+        CAST(:sellers AS varchar[]),
+        CAST(:change_types AS varchar[])
+    ) AS b(product_id, price, currency, availability, seller, change_type)
+""")
+
+# Tells the API that cached responses are stale once this batch commits
+BUMP_GENERATION_QUERY = text("""
+    UPDATE ingest_state SET generation = generation + 1, updated_at = NOW() WHERE id = 1
+""")
+
+CENTS = Decimal("0.01")
+
+
+def dedupe_products(products: Sequence) -> List:
+    """Keep the last record per ASIN, preserving first-seen order."""
+    latest = {}
+    for product in products:
+        latest[product.asin] = product
+    return list(latest.values())
+
+
+def normalize_price(value) -> Optional[Decimal]:
+    """Round a price to the cents stored in DECIMAL(10, 2)."""
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def detect_change(previous, product) -> Optional[str]:
+    """Return the offer_history change_type for a product, or None if unchanged."""
+    if previous is None:
+        return "initial"
+    if normalize_price(previous.price) != normalize_price(product.price):
+        return "price_change"
+    if previous.availability != product.availability:
+        return "availability_change"
+    if previous.seller != product.seller or previous.currency != product.currency:
+        return "other"
+    return None
+
+
+async def load_latest_offers(session: AsyncSession, asins: Sequence[str]) -> dict:
+    """Load the latest offer per ASIN for a whole batch in one query."""
+    if not asins:
+        return {}
+
+    result = await session.execute(LATEST_OFFERS_QUERY, {"asins": list(asins)})
+    return {row.product_id: row for row in result.fetchall()}
+
+
+def _offer_params(products: Sequence) -> dict:
+    return {
+        "asins": [p.asin for p in products],
+        "prices": [normalize_price(p.price) for p in products],
+        "currencies": [p.currency for p in products],
+        "availabilities": [p.availability for p in products],
+        "sellers": [p.seller for p in products],
+    }
+
+
+async def write_products(session: AsyncSession, products: Sequence):
+    """
+    Write a batch of products with set-based statements.
+
+    Upserts products, extends the offers run of every product whose offer is
+    unchanged and starts a new run for the rest (keeping current_offers in
+    step), records offer_history rows only for offers that are new or
+    actually changed, then bumps the ingest generation. Does not commit.
+    Returns the number of distinct products written.
+    """
+    products = dedupe_products(products)
+    if not products:
+        return 0
+
+    asins = [p.asin for p in products]
+
+    await session.execute(UPSERT_PRODUCTS_QUERY, {
+        "asins": asins,
+        "titles": [p.title for p in products],
+        "brands": [p.brand for p in products],
+        "categories": [p.category for p in products],
+        "image_urls": [p.image_url for p in products],
+    })
+
+    latest_offers = await load_latest_offers(session, asins)
+    changes, unchanged = [], []
+    for product in products:
+        previous = latest_offers.get(product.asin)
+        change_type = detect_change(previous, product)
+        if change_type:
+            changes.append((product, change_type))
+        else:
+            unchanged.append(previous)
+
+    extended = set()
+    if unchanged:
+        result = await session.execute(EXTEND_OFFERS_QUERY, {
+            "offer_ids": [offer.offer_id for offer in unchanged],
+            "first_seen_ats": [offer.first_seen_at for offer in unchanged],
+        })
+        extended = set(result.scalars().all())
+
+    new_runs = [product for product in products if product.asin not in extended]
+    if new_runs:
+        await session.execute(INSERT_OFFERS_QUERY, _offer_params(new_runs))
+
+    if changes:
+        params = _offer_params([product for product, _ in changes])
+        params["change_types"] = [change_type for _, change_type in changes]
+        await session.execute(INSERT_HISTORY_QUERY, params)
+
+    await session.execute(BUMP_GENERATION_QUERY)
+    return len(products)
@@ -1,5 +1,5 @@
 import { Suspense } from "react"
-import { getProducts } from "@/lib/fetcher"
+import { getProducts, getStats } from "@/lib/fetcher"
 import { KPICard } from "../_components/kpi-card"
 import { AreaTrend } from "../_components/area-trend"
 import { RecentProducts } from "../_components/recent-products"
@@ -8,45 +8,23 @@ import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
 import { formatMoney } from "@/lib/format"
 
 async function OverviewData() {
-  const data = await getProducts({ limit: 100 })
-  const products = data.products
+  // KPIs and the trend come from catalog-wide rollups; only the recent list is a product query
+  const [stats, recent] = await Promise.all([getStats(), getProducts({ limit: 5 })])
 
-  const totalProducts = products.length
-  const inStockCount = products.filter((p) => 
-    p.latest_offer?.availability?.toLowerCase().includes("stock") ||
-    p.latest_offer?.availability?.toLowerCase().includes("available")
-  ).length
-  const inStockPercent = totalProducts > 0 ? Math.round((inStockCount / totalProducts) * 100) : 0
+  const totalProducts = stats.product_count
+  const inStockCount = stats.in_stock_count
+  const inStockPercent = Math.round(stats.in_stock_ratio * 100)
+  const medianPrice = stats.median_price ?? 0
+  const avgPrice = stats.avg_price ?? 0
 
-  const prices = products
-    .map((p) => p.latest_offer?.price)
-    .filter((p): p is number => p !== undefined && p !== null)
+  const trendData = stats.trend
+    .filter((day) => day.avg_price !== null)
+    .map((day) => ({
+      date: new Date(`${day.day}T00:00:00Z`).toLocaleDateString("en-US", { month: "short", day: "numeric", timeZone: "UTC" }),
+      avgPrice: day.avg_price as number,
+    }))
 
-  const medianPrice = prices.length > 0
-    ? prices.sort((a, b) => a - b)[Math.floor(prices.length / 2)]
-    : 0
-
-  const avgPrice = prices.length > 0
-    ? prices.reduce((a, b) => a + b, 0) / prices.length
-    : 0
-
-  // Generate 30-day trend data (mock aggregation by day)
-  const trendData = Array.from({ length: 30 }, (_, i) => {
-    const date = new Date()
-    date.setDate(date.getDate() - (29 - i))
-    return {
-      date: date.toLocaleDateString("en-US", { month: "short", day: "numeric" }),
-      avgPrice: avgPrice + (Math.random() * avgPrice * 0.1 - avgPrice * 0.05),
-    }
-  })
-
-  const recentProducts = products
-    .sort((a, b) => {
-      const aTime = a.latest_offer?.fetched_at ? new Date(a.latest_offer.fetched_at).getTime() : 0
-      const bTime = b.latest_offer?.fetched_at ? new Date(b.latest_offer.fetched_at).getTime() : 0
-      return bTime - aTime
-    })
-    .slice(0, 5)
+  const recentProducts = recent.products
 
   return (
     <>
@@ -70,6 +48,7 @@ async function OverviewData() {
         <KPICard
           title="Average Price"
           value={formatMoney(avgPrice)}
+          delta={`${stats.price_changes_30d} price changes in 30 days`}
           icon="DollarSign"
         />
       </div>
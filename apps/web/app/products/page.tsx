@@ -1,5 +1,5 @@
 import { Suspense } from "react"
-import { getProducts } from "@/lib/fetcher"
+import { getFacets, getProducts } from "@/lib/fetcher"
 import { ProductsTable } from "../_components/products-table"
 import { Filters } from "../_components/filters"
 import { EmptyState } from "../_components/empty-state"
@@ -22,22 +22,25 @@ async function ProductsList({
   const limit = typeof searchParams.limit === "string" ? parseInt(searchParams.limit, 10) : 50
   const offset = typeof searchParams.offset === "string" ? parseInt(searchParams.offset, 10) : 0
 
-  const data = await getProducts({
-    search,
-    brand,
-    category,
-    min_price: minPrice,
-    max_price: maxPrice,
-    in_stock: inStock,
-    limit,
-    offset,
-  })
+  // Unfiltered facets list every brand and category, not just those on this page
+  const [data, facets] = await Promise.all([
+    getProducts({
+      search,
+      brand,
+      category,
+      min_price: minPrice,
+      max_price: maxPrice,
+      in_stock: inStock,
+      limit,
+      offset,
+    }),
+    getFacets(),
+  ])
 
   const products = data.products
 
-  // Extract unique brands and categories for filters
-  const brands = Array.from(new Set(products.map((p) => p.brand).filter(Boolean))) as string[]
-  const categories = Array.from(new Set(products.map((p) => p.category).filter(Boolean))) as string[]
+  const brands = facets.brands.map((b) => b.value)
+  const categories = facets.categories.map((c) => c.value)
 
   const nextOffset = offset + limit
   const prevOffset = Math.max(0, offset - limit)
@@ -58,6 +58,7 @@ export async function getProducts(params?: {
   in_stock?: boolean
   limit?: number
   offset?: number
+  cursor?: string
 }) {
   const searchParams = new URLSearchParams()
   
@@ -69,6 +70,7 @@ export async function getProducts(params?: {
   if (params?.in_stock !== undefined) searchParams.set('in_stock', params.in_stock.toString())
   if (params?.limit !== undefined) searchParams.set('limit', params.limit.toString())
   if (params?.offset !== undefined) searchParams.set('offset', params.offset.toString())
+  if (params?.cursor) searchParams.set('cursor', params.cursor)
 
   const query = searchParams.toString()
   return getJSON<{
@@ -88,10 +90,46 @@ export async function getProducts(params?: {
     }>
     limit: number
     offset: number
+    next_cursor: string | null
   }>(`/products?${query}`, { next: { revalidate: 0 } })
 }
 
-export async function getProduct(asin: string) {
+export async function getFacets(params?: {
+  search?: string
+  brand?: string
+  category?: string
+  min_price?: number
+  max_price?: number
+  in_stock?: boolean
+}) {
+  const searchParams = new URLSearchParams()
+
+  if (params?.search) searchParams.set('q', params.search)
+  if (params?.brand) searchParams.set('brand', params.brand)
+  if (params?.category) searchParams.set('category', params.category)
+  if (params?.min_price !== undefined) searchParams.set('min_price', params.min_price.toString())
+  if (params?.max_price !== undefined) searchParams.set('max_price', params.max_price.toString())
+  if (params?.in_stock !== undefined) searchParams.set('in_stock', params.in_stock.toString())
+
+  const query = searchParams.toString()
+  return getJSON<{
+    brands: Array<{ value: string; count: number }>
+    categories: Array<{ value: string; count: number }>
+    stock: { in_stock: number; out_of_stock: number }
+    price_buckets: Array<{ min: number; max: number | null; count: number }>
+  }>(`/products/facets${query ? `?${query}` : ''}`, { next: { revalidate: 0 } })
+}
+
+export async function getProduct(asin: string, params?: {
+  points?: number
+  range?: '24h' | '7d' | '30d' | '90d' | '180d' | '365d'
+}) {
+  const searchParams = new URLSearchParams()
+
+  if (params?.points !== undefined) searchParams.set('points', params.points.toString())
+  if (params?.range) searchParams.set('range', params.range)
+
+  const query = searchParams.toString()
   return getJSON<{
     asin: string
     title: string
@@ -111,9 +149,30 @@ export async function getProduct(asin: string) {
       price: number
       currency: string
       availability: string
-      change_type?: string
+      change_type?: string | null
       fetched_at: string
+      min_price: number
+      max_price: number
     }>
-  }>(`/products/${asin}`, { next: { revalidate: 0 } })
+  }>(`/products/${asin}${query ? `?${query}` : ''}`, { next: { revalidate: 0 } })
 }
 
+export async function getStats() {
+  return getJSON<{
+    product_count: number
+    priced_count: number
+    in_stock_count: number
+    in_stock_ratio: number
+    avg_price: number | null
+    median_price: number | null
+    price_changes_30d: number
+    refreshed_at: string | null
+    trend: Array<{
+      day: string
+      offers_count: number
+      avg_price: number | null
+      price_changes: number
+      availability_changes: number
+    }>
+  }>(`/stats`, { next: { revalidate: 0 } })
+}
@@ -1,3 +1,6 @@
+-- Trigram indexes for substring and typo-tolerant title search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Create products table
 CREATE TABLE IF NOT EXISTS products (
     asin VARCHAR(10) PRIMARY KEY,
@@ -9,47 +12,204 @@ CREATE TABLE IF NOT EXISTS products (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
--- Create offers table
+-- Full-text search vector over title and brand, maintained by Postgres
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(brand, '')), 'B')
+    ) STORED;
+
+-- Create offers table, partitioned by month on fetched_at so old months can
+-- be detached or dropped (see `python run.py partitions`). Each row is a run
+-- of identical observations: fetched_at is when the offer was first seen and
+-- last_seen_at is bumped in place by every ingest that sees it unchanged.
 CREATE TABLE IF NOT EXISTS offers (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     product_id VARCHAR(10) NOT NULL REFERENCES products(asin) ON DELETE CASCADE,
     price DECIMAL(10, 2),
     currency VARCHAR(3) DEFAULT 'USD',
     availability TEXT,
     seller VARCHAR(255),
-    fetched_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
+    fetched_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    last_seen_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, fetched_at)
+) PARTITION BY RANGE (fetched_at);
 
--- Create offer_history table
+-- Create offer_history table, partitioned the same way
 CREATE TABLE IF NOT EXISTS offer_history (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     product_id VARCHAR(10) NOT NULL REFERENCES products(asin) ON DELETE CASCADE,
     price DECIMAL(10, 2),
     currency VARCHAR(3),
     availability TEXT,
     seller VARCHAR(255),
     change_type VARCHAR(50),
-    fetched_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    fetched_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, fetched_at)
+) PARTITION BY RANGE (fetched_at);
+
+-- Catch-all partitions, so a write never fails for want of a monthly partition.
+-- On a database whose offers predate partitioning, the CREATE TABLEs above
+-- were skipped; the partition-only statements wait for the migrations.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'offers'::regclass) THEN
+        CREATE TABLE IF NOT EXISTS offers_default PARTITION OF offers DEFAULT;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'offer_history'::regclass) THEN
+        CREATE TABLE IF NOT EXISTS offer_history_default PARTITION OF offer_history DEFAULT;
+    END IF;
+END;
+$$;
+
+-- Create (or return NULL if it exists) the monthly partition of offers or
+-- offer_history holding `month`, e.g. offers_y2024m05. Months are UTC. Rows
+-- that already landed in the default partition for that month are moved in.
+CREATE OR REPLACE FUNCTION ensure_monthly_partition(parent TEXT, month DATE)
+RETURNS TEXT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    month_start DATE := date_trunc('month', month);
+    range_start TIMESTAMP WITH TIME ZONE := CAST(month_start AS timestamp) AT TIME ZONE 'UTC';
+    range_end TIMESTAMP WITH TIME ZONE := CAST(month_start + INTERVAL '1 month' AS timestamp) AT TIME ZONE 'UTC';
+    partition_name TEXT := format('%s_y%sm%s', parent, to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name, parent);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM %I WHERE fetched_at >= $1 AND fetched_at < $2 RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved',
+        parent || '_default', partition_name
+    ) USING range_start, range_end;
+    EXECUTE format(
+        'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        parent, partition_name, range_start, range_end
+    );
+    RETURN partition_name;
+END;
+$$;
+
+-- Create partitions for the seed data's month range and a few months ahead
+SELECT ensure_monthly_partition(parent, CAST(month AS date))
+FROM unnest(ARRAY['offers', 'offer_history']) AS parent,
+     generate_series(
+         date_trunc('month', NOW() AT TIME ZONE 'UTC') - INTERVAL '2 months',
+         date_trunc('month', NOW() AT TIME ZONE 'UTC') + INTERVAL '3 months',
+         INTERVAL '1 month'
+     ) AS month
+WHERE EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(parent));
+
+-- Create ingest_state table: a single row whose generation the ingestor bumps
+-- with every committed write, used by the API to invalidate cached responses
+CREATE TABLE IF NOT EXISTS ingest_state (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    generation BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+INSERT INTO ingest_state (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+-- Create rollup tables for the dashboard, refreshed at the end of each ingest
+CREATE TABLE IF NOT EXISTS catalog_stats (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    product_count INTEGER NOT NULL DEFAULT 0,
+    priced_count INTEGER NOT NULL DEFAULT 0,
+    in_stock_count INTEGER NOT NULL DEFAULT 0,
+    avg_price DECIMAL(10, 2),
+    median_price DECIMAL(10, 2),
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS daily_stats (
+    day DATE PRIMARY KEY,
+    offers_count INTEGER NOT NULL DEFAULT 0,
+    avg_price DECIMAL(10, 2),
+    price_changes INTEGER NOT NULL DEFAULT 0,
+    availability_changes INTEGER NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Create price_daily table: per-product daily OHLC of offer_history, for
+-- price charts longer than raw history can serve. Only days with changes have
+-- a row; readers carry the previous close forward. Maintained incrementally
+-- after each ingest; `python run.py backfill-prices` rebuilds older days.
+CREATE TABLE IF NOT EXISTS price_daily (
+    product_id VARCHAR(10) NOT NULL REFERENCES products(asin) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    open DECIMAL(10, 2),
+    high DECIMAL(10, 2),
+    low DECIMAL(10, 2),
+    close DECIMAL(10, 2),
+    currency VARCHAR(3),
+    availability TEXT,
+    in_stock_minutes INTEGER NOT NULL DEFAULT 0,
+    change_count INTEGER NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (product_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS facet_counts (
+    facet VARCHAR(20) NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (facet, value)
+);
+
+INSERT INTO catalog_stats (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
 -- Create index for efficient latest offer queries
 CREATE INDEX IF NOT EXISTS idx_offers_latest ON offers(product_id, fetched_at DESC);
 
+-- Create index for keyset pagination of the product list
+CREATE INDEX IF NOT EXISTS idx_products_updated_asin ON products(updated_at DESC, asin DESC);
+
+-- Create indexes for the q search on /products
+CREATE INDEX IF NOT EXISTS idx_products_search_vector ON products USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_products_title_trgm ON products USING GIN (title gin_trgm_ops);
+
+-- Create indexes for filtered facet counts on /products/facets
+CREATE INDEX IF NOT EXISTS idx_products_brand ON products(brand);
+CREATE INDEX IF NOT EXISTS idx_products_category ON products(category);
+
+-- Create indexes for the daily rollup, which scans recent offers and history by time
+CREATE INDEX IF NOT EXISTS idx_offers_fetched_at ON offers(fetched_at);
+CREATE INDEX IF NOT EXISTS idx_offer_history_fetched_at ON offer_history(fetched_at);
+
 -- Create index on offer_history for sparkline queries
 CREATE INDEX IF NOT EXISTS idx_offer_history_product_fetched ON offer_history(product_id, fetched_at DESC);
 
+-- Create current_offers table: the latest offer per product, maintained by
+-- the ingestor in the same statement that writes to offers. fetched_at is
+-- the last time the offer was seen; (offer_id, first_seen_at) is its offers row.
+CREATE TABLE IF NOT EXISTS current_offers (
+    product_id VARCHAR(10) PRIMARY KEY REFERENCES products(asin) ON DELETE CASCADE,
+    offer_id INTEGER NOT NULL,
+    first_seen_at TIMESTAMP WITH TIME ZONE,
+    price DECIMAL(10, 2),
+    currency VARCHAR(3) DEFAULT 'USD',
+    availability TEXT,
+    seller VARCHAR(255),
+    fetched_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Create index for price filters and facets on the latest offer
+CREATE INDEX IF NOT EXISTS idx_current_offers_price ON current_offers(price);
+
 -- Create view for latest offers
 CREATE OR REPLACE VIEW v_latest_offers AS
-SELECT DISTINCT ON (product_id)
-    o.id,
-    o.product_id,
-    o.price,
-    o.currency,
-    o.availability,
-    o.seller,
-    o.fetched_at
-FROM offers o
-ORDER BY o.product_id, o.fetched_at DESC;
+SELECT
+    co.offer_id AS id,
+    co.product_id,
+    co.price,
+    co.currency,
+    co.availability,
+    co.seller,
+    co.fetched_at
+FROM current_offers co;
 
 -- Seed data for development/demo purposes
 -- Insert sample products
@@ -65,21 +225,51 @@ VALUES
     ('B07YVLGXJV', 'Kindle Paperwhite (11th Generation)', 'Amazon', 'Electronics', 'https://m.media-amazon.com/images/I/61ZPDQoWBfL._AC_SL1000_.jpg', NOW() - INTERVAL '7 days', NOW() - INTERVAL '7 days')
 ON CONFLICT (asin) DO NOTHING;
 
--- Insert sample offers (only if they don't exist for these products)
-INSERT INTO offers (product_id, price, currency, availability, seller, fetched_at)
-SELECT * FROM (VALUES 
-    ('B07XJ8C8F5'::VARCHAR, 29.99, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '1 hour'),
-    ('B09JQMJSXY'::VARCHAR, 499.99, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '2 hours'),
-    ('B08N5WRWNW'::VARCHAR, 249.00, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '3 hours'),
-    ('B0B7BP6CJN'::VARCHAR, 1299.99, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '4 hours'),
-    ('B08G9PRS1K'::VARCHAR, 349.99, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '5 hours'),
-    ('B07HZLHPKP'::VARCHAR, 84.99, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '6 hours'),
-    ('B09B8V1LZ3'::VARCHAR, 599.00, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '7 hours'),
-    ('B07YVLGXJV'::VARCHAR, 139.99, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '8 hours')
-) AS v(asin, price, currency, availability, seller, fetched_at)
-WHERE NOT EXISTS (
-    SELECT 1 FROM offers WHERE product_id = v.asin
-);
+-- Insert sample offers (only if they don't exist for these products) and
+-- backfill current_offers from offers. Safe to re-run on an existing database;
+-- skipped until db/migrations/005_run_length_offers.sql has added last_seen_at.
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'offers' AND column_name = 'last_seen_at'
+    ) THEN
+        RAISE NOTICE 'offers predates db/migrations/005_run_length_offers.sql; skipping the offers seed';
+        RETURN;
+    END IF;
+
+    INSERT INTO offers (product_id, price, currency, availability, seller, fetched_at, last_seen_at)
+    SELECT v.*, v.fetched_at FROM (VALUES 
+        ('B07XJ8C8F5'::VARCHAR, 29.99, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '1 hour'),
+        ('B09JQMJSXY'::VARCHAR, 499.99, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '2 hours'),
+        ('B08N5WRWNW'::VARCHAR, 249.00, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '3 hours'),
+        ('B0B7BP6CJN'::VARCHAR, 1299.99, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '4 hours'),
+        ('B08G9PRS1K'::VARCHAR, 349.99, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '5 hours'),
+        ('B07HZLHPKP'::VARCHAR, 84.99, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '6 hours'),
+        ('B09B8V1LZ3'::VARCHAR, 599.00, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '7 hours'),
+        ('B07YVLGXJV'::VARCHAR, 139.99, 'USD', 'In Stock', 'Amazon.com', NOW() - INTERVAL '8 hours')
+    ) AS v(asin, price, currency, availability, seller, fetched_at)
+    WHERE NOT EXISTS (
+        SELECT 1 FROM offers WHERE product_id = v.asin
+    );
+
+    -- Backfill current_offers from offers
+    INSERT INTO current_offers (product_id, offer_id, first_seen_at, price, currency, availability, seller, fetched_at)
+    SELECT DISTINCT ON (product_id)
+        product_id, id, fetched_at, price, currency, availability, seller, last_seen_at
+    FROM offers
+    ORDER BY product_id, fetched_at DESC, id DESC
+    ON CONFLICT (product_id) DO UPDATE SET
+        offer_id = EXCLUDED.offer_id,
+        first_seen_at = EXCLUDED.first_seen_at,
+        price = EXCLUDED.price,
+        currency = EXCLUDED.currency,
+        availability = EXCLUDED.availability,
+        seller = EXCLUDED.seller,
+        fetched_at = EXCLUDED.fetched_at
+    WHERE current_offers.fetched_at <= EXCLUDED.fetched_at;
+END;
+$$;
 
 -- Insert some price history for sparkline visualization
 -- Echo Dot price variations over the last 30 days
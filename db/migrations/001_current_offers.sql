@@ -0,0 +1,48 @@
+-- Add current_offers, the latest offer per product maintained by the
+-- ingestor, backfill it from offers and point v_latest_offers at it.
+--
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f db/migrations/001_current_offers.sql
+--
+-- Safe to re-run. Apply the migrations in order: 005_run_length_offers.sql
+-- adds first_seen_at to this table.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS current_offers (
+    product_id VARCHAR(10) PRIMARY KEY REFERENCES products(asin) ON DELETE CASCADE,
+    offer_id INTEGER NOT NULL,
+    price DECIMAL(10, 2),
+    currency VARCHAR(3) DEFAULT 'USD',
+    availability TEXT,
+    seller VARCHAR(255),
+    fetched_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+INSERT INTO current_offers (product_id, offer_id, price, currency, availability, seller, fetched_at)
+SELECT DISTINCT ON (product_id)
+    product_id, id, price, currency, availability, seller, fetched_at
+FROM offers
+ORDER BY product_id, fetched_at DESC, id DESC
+ON CONFLICT (product_id) DO UPDATE SET
+    offer_id = EXCLUDED.offer_id,
+    price = EXCLUDED.price,
+    currency = EXCLUDED.currency,
+    availability = EXCLUDED.availability,
+    seller = EXCLUDED.seller,
+    fetched_at = EXCLUDED.fetched_at
+WHERE current_offers.fetched_at <= EXCLUDED.fetched_at;
+
+CREATE OR REPLACE VIEW v_latest_offers AS
+SELECT
+    co.offer_id AS id,
+    co.product_id,
+    co.price,
+    co.currency,
+    co.availability,
+    co.seller,
+    co.fetched_at
+FROM current_offers co;
+
+COMMIT;
+
+ANALYZE current_offers;
@@ -0,0 +1,24 @@
+-- Add the keyset pagination index and the full-text and trigram search
+-- behind the q parameter of GET /products.
+--
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f db/migrations/002_product_search.sql
+--
+-- Safe to re-run. Adding search_vector rewrites products.
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(brand, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_products_updated_asin ON products(updated_at DESC, asin DESC);
+CREATE INDEX IF NOT EXISTS idx_products_search_vector ON products USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_products_title_trgm ON products USING GIN (title gin_trgm_ops);
+
+COMMIT;
+
+ANALYZE products;
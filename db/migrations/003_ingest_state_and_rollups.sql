@@ -0,0 +1,53 @@
+-- Add ingest_state, whose generation invalidates the API's cached responses,
+-- and the dashboard rollups behind /stats and /products/facets.
+--
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f db/migrations/003_ingest_state_and_rollups.sql
+--
+-- Safe to re-run. Needs 001_current_offers.sql. The ingestor fills the
+-- rollups on its next cycle.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS ingest_state (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    generation BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+INSERT INTO ingest_state (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS catalog_stats (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    product_count INTEGER NOT NULL DEFAULT 0,
+    priced_count INTEGER NOT NULL DEFAULT 0,
+    in_stock_count INTEGER NOT NULL DEFAULT 0,
+    avg_price DECIMAL(10, 2),
+    median_price DECIMAL(10, 2),
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+INSERT INTO catalog_stats (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS daily_stats (
+    day DATE PRIMARY KEY,
+    offers_count INTEGER NOT NULL DEFAULT 0,
+    avg_price DECIMAL(10, 2),
+    price_changes INTEGER NOT NULL DEFAULT 0,
+    availability_changes INTEGER NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS facet_counts (
+    facet VARCHAR(20) NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (facet, value)
+);
+
+CREATE INDEX IF NOT EXISTS idx_offers_fetched_at ON offers(fetched_at);
+CREATE INDEX IF NOT EXISTS idx_offer_history_fetched_at ON offer_history(fetched_at);
+CREATE INDEX IF NOT EXISTS idx_products_brand ON products(brand);
+CREATE INDEX IF NOT EXISTS idx_products_category ON products(category);
+CREATE INDEX IF NOT EXISTS idx_current_offers_price ON current_offers(price);
+
+COMMIT;
@@ -0,0 +1,114 @@
+-- Convert offers and offer_history on an existing database into tables
+-- partitioned by month on fetched_at, as created by db/init.sql.
+--
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f db/migrations/004_partition_offers.sql
+--
+-- Runs in one transaction and rewrites both tables, so stop the ingestor first.
+-- Sequences are kept, so offer ids (and current_offers.offer_id) stay valid.
+
+BEGIN;
+
+ALTER TABLE offers RENAME TO offers_unpartitioned;
+ALTER TABLE offer_history RENAME TO offer_history_unpartitioned;
+
+-- Keep the id sequences when the old tables are dropped
+ALTER SEQUENCE offers_id_seq OWNED BY NONE;
+ALTER SEQUENCE offer_history_id_seq OWNED BY NONE;
+
+DROP INDEX IF EXISTS idx_offers_latest;
+DROP INDEX IF EXISTS idx_offers_fetched_at;
+DROP INDEX IF EXISTS idx_offer_history_fetched_at;
+DROP INDEX IF EXISTS idx_offer_history_product_fetched;
+
+CREATE TABLE offers (
+    id INTEGER NOT NULL DEFAULT nextval('offers_id_seq'),
+    product_id VARCHAR(10) NOT NULL REFERENCES products(asin) ON DELETE CASCADE,
+    price DECIMAL(10, 2),
+    currency VARCHAR(3) DEFAULT 'USD',
+    availability TEXT,
+    seller VARCHAR(255),
+    fetched_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, fetched_at)
+) PARTITION BY RANGE (fetched_at);
+
+CREATE TABLE offer_history (
+    id INTEGER NOT NULL DEFAULT nextval('offer_history_id_seq'),
+    product_id VARCHAR(10) NOT NULL REFERENCES products(asin) ON DELETE CASCADE,
+    price DECIMAL(10, 2),
+    currency VARCHAR(3),
+    availability TEXT,
+    seller VARCHAR(255),
+    change_type VARCHAR(50),
+    fetched_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, fetched_at)
+) PARTITION BY RANGE (fetched_at);
+
+ALTER SEQUENCE offers_id_seq OWNED BY offers.id;
+ALTER SEQUENCE offer_history_id_seq OWNED BY offer_history.id;
+
+CREATE TABLE offers_default PARTITION OF offers DEFAULT;
+CREATE TABLE offer_history_default PARTITION OF offer_history DEFAULT;
+
+-- Same definition as in db/init.sql
+CREATE OR REPLACE FUNCTION ensure_monthly_partition(parent TEXT, month DATE)
+RETURNS TEXT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    month_start DATE := date_trunc('month', month);
+    range_start TIMESTAMP WITH TIME ZONE := CAST(month_start AS timestamp) AT TIME ZONE 'UTC';
+    range_end TIMESTAMP WITH TIME ZONE := CAST(month_start + INTERVAL '1 month' AS timestamp) AT TIME ZONE 'UTC';
+    partition_name TEXT := format('%s_y%sm%s', parent, to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name, parent);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM %I WHERE fetched_at >= $1 AND fetched_at < $2 RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved',
+        parent || '_default', partition_name
+    ) USING range_start, range_end;
+    EXECUTE format(
+        'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        parent, partition_name, range_start, range_end
+    );
+    RETURN partition_name;
+END;
+$$;
+
+-- One partition per month that has data, through three months ahead
+SELECT ensure_monthly_partition(parent, CAST(month AS date))
+FROM (
+    SELECT 'offers' AS parent, MIN(fetched_at) AS first_fetched_at FROM offers_unpartitioned
+    UNION ALL
+    SELECT 'offer_history', MIN(fetched_at) FROM offer_history_unpartitioned
+) tables,
+generate_series(
+    date_trunc('month', COALESCE(first_fetched_at, NOW()) AT TIME ZONE 'UTC'),
+    date_trunc('month', NOW() AT TIME ZONE 'UTC') + INTERVAL '3 months',
+    INTERVAL '1 month'
+) AS month;
+
+INSERT INTO offers (id, product_id, price, currency, availability, seller, fetched_at)
+SELECT id, product_id, price, currency, availability, seller, COALESCE(fetched_at, NOW())
+FROM offers_unpartitioned;
+
+INSERT INTO offer_history (id, product_id, price, currency, availability, seller, change_type, fetched_at)
+SELECT id, product_id, price, currency, availability, seller, change_type, COALESCE(fetched_at, NOW())
+FROM offer_history_unpartitioned;
+
+DROP TABLE offers_unpartitioned;
+DROP TABLE offer_history_unpartitioned;
+
+-- Indexes on the parents cascade to every partition
+CREATE INDEX idx_offers_latest ON offers(product_id, fetched_at DESC);
+CREATE INDEX idx_offers_fetched_at ON offers(fetched_at);
+CREATE INDEX idx_offer_history_fetched_at ON offer_history(fetched_at);
+CREATE INDEX idx_offer_history_product_fetched ON offer_history(product_id, fetched_at DESC);
+
+COMMIT;
+
+ANALYZE offers;
+ANALYZE offer_history;
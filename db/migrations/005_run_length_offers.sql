@@ -0,0 +1,73 @@
+-- Store offers as runs: one row per stretch of identical observations, with
+-- fetched_at as when it was first seen and last_seen_at as when it was last
+-- seen. Compacts the existing rows of every product into such runs.
+--
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f db/migrations/005_run_length_offers.sql
+--
+-- Needs 001_current_offers.sql and 004_partition_offers.sql. Stop the ingestor first.
+
+BEGIN;
+
+ALTER TABLE offers ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP WITH TIME ZONE;
+UPDATE offers SET last_seen_at = fetched_at WHERE last_seen_at IS NULL;
+ALTER TABLE offers ALTER COLUMN last_seen_at SET DEFAULT NOW();
+ALTER TABLE offers ALTER COLUMN last_seen_at SET NOT NULL;
+
+ALTER TABLE current_offers ADD COLUMN IF NOT EXISTS first_seen_at TIMESTAMP WITH TIME ZONE;
+
+-- Number consecutive identical rows per product into runs (gaps and islands)
+CREATE TEMPORARY TABLE offer_runs ON COMMIT DROP AS
+SELECT
+    id,
+    fetched_at,
+    first_value(id) OVER run AS run_id,
+    first_value(fetched_at) OVER run AS run_first_seen_at,
+    max(last_seen_at) OVER run AS run_last_seen_at
+FROM (
+    SELECT
+        *,
+        SUM(starts_run) OVER (PARTITION BY product_id ORDER BY fetched_at, id) AS run
+    FROM (
+        SELECT
+            o.*,
+            CASE
+                WHEN (price, currency, availability, seller) IS NOT DISTINCT FROM (
+                    LAG(price) OVER previous,
+                    LAG(currency) OVER previous,
+                    LAG(availability) OVER previous,
+                    LAG(seller) OVER previous
+                ) AND LAG(id) OVER previous IS NOT NULL THEN 0
+                ELSE 1
+            END AS starts_run
+        FROM offers o
+        WINDOW previous AS (PARTITION BY product_id ORDER BY fetched_at, id)
+    ) flagged
+) numbered
+WINDOW run AS (
+    PARTITION BY product_id, run
+    ORDER BY fetched_at, id
+    ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+);
+
+UPDATE offers o
+SET last_seen_at = r.run_last_seen_at
+FROM offer_runs r
+WHERE o.id = r.id AND o.fetched_at = r.fetched_at AND r.id = r.run_id;
+
+DELETE FROM offers o
+USING offer_runs r
+WHERE o.id = r.id AND o.fetched_at = r.fetched_at AND r.id <> r.run_id;
+
+-- Point current_offers at the run holding its latest row
+UPDATE current_offers co
+SET offer_id = r.run_id, first_seen_at = r.run_first_seen_at
+FROM offer_runs r
+WHERE r.id = co.offer_id;
+
+-- daily_stats counted rows per day; recount it as offers seen per day
+DELETE FROM daily_stats;
+
+COMMIT;
+
+-- Give the space back; the ingestor rebuilds daily_stats on its next cycle
+VACUUM ANALYZE offers;
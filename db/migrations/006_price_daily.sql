@@ -0,0 +1,22 @@
+-- Add price_daily, the per-product daily OHLC rollup behind the 180d and
+-- 365d sparklines. Only days with changes have a row.
+--
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f db/migrations/006_price_daily.sql
+--
+-- Safe to re-run. The ingestor builds the last PRICE_DAILY_INITIAL_DAYS days
+-- on its next cycle; run `python run.py backfill-prices` for older history.
+
+CREATE TABLE IF NOT EXISTS price_daily (
+    product_id VARCHAR(10) NOT NULL REFERENCES products(asin) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    open DECIMAL(10, 2),
+    high DECIMAL(10, 2),
+    low DECIMAL(10, 2),
+    close DECIMAL(10, 2),
+    currency VARCHAR(3),
+    availability TEXT,
+    in_stock_minutes INTEGER NOT NULL DEFAULT 0,
+    change_count INTEGER NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (product_id, day)
+);
@@ -0,0 +1,5 @@
+#!/bin/sh
+# Let the optional read replica (docker compose --profile replica) stream WAL
+# from this server. Runs once, when the data volume is first initialized.
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"